@@ -1,20 +1,94 @@
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from PIL import Image
-from dotenv import load_dotenv
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(APP_DIR))
+from genai_common import get_client, is_fake_backend, load_api_key, tracing  # noqa: E402
+from route_cache import Precomputer, RouteCache  # noqa: E402
+from travel_modes import MODES, build_mode_chain, mode_inputs, parse_options  # noqa: E402
 
 # Load the API key from .travel_ai_env
-load_dotenv(".travel_ai_env")
-api_key = os.getenv("GOOGLE_API_KEY")  # Fetch the API key
+api_key = load_api_key(APP_DIR, ".travel_ai_env")  # Fetch the API key
+
+# Route cache settings: results are reused for ROUTE_TTL_HOURS; the most requested pairs are refreshed in the background
+ROUTE_TTL_HOURS = float(os.environ.get("TRAVEL_ROUTE_TTL_HOURS", "6"))
+ROUTE_CACHE_MAX_ENTRIES = int(os.environ.get("TRAVEL_ROUTE_CACHE_MAX_ENTRIES", "2000"))
+PRECOMPUTE_TOP_N = int(os.environ.get("TRAVEL_PRECOMPUTE_TOP_N", "20"))
+PRECOMPUTE_INTERVAL_MINUTES = float(os.environ.get("TRAVEL_PRECOMPUTE_INTERVAL_MINUTES", "30"))
+# Only pairs requested at least this often in the last week, and at least once within the active window
+PRECOMPUTE_MIN_REQUESTS = int(os.environ.get("TRAVEL_PRECOMPUTE_MIN_REQUESTS", "3"))
+PRECOMPUTE_ACTIVE_HOURS = float(os.environ.get("TRAVEL_PRECOMPUTE_ACTIVE_HOURS", "24"))
+
+# Span timings go to traces/travel.jsonl (and /metrics when GENAI_METRICS_PORT is set)
+tracing.configure("travel")
+
+
+def generate_route(source, destination, mode):
+    """JSON options for one transport mode."""
+    # Shared, rate-limited client (one per process, reused across clicks and sessions)
+    chat_model = get_client(api_key=api_key, model="gemini-1.5-pro").as_runnable()
+    chain = build_mode_chain(chat_model)
+    return chain.invoke(mode_inputs(source, destination, mode))
+
+
+def plan_route(source, destination, mode):
+    with tracing.span("travel.plan_route", mode=mode):
+        return generate_route(source, destination, mode)
+
+
+# Background refreshes get their own span so they stay out of the user-facing latency figures
+def precompute_route(source, destination, mode):
+    with tracing.span("travel.precompute_route", mode=mode):
+        result = generate_route(source, destination, mode)
+    # Raising makes the precomputer skip caching a reply the tables cannot show
+    if parse_options(result) is None:
+        raise ValueError("reply is not a JSON array of options")
+    return result
+
+
+# Route results shared across sessions and restarts; the fake backend gets its own file
+@st.cache_resource
+def load_route_cache():
+    cache_path = os.path.join(APP_DIR, f"route_cache{'_fake' if is_fake_backend() else ''}.sqlite3")
+    return RouteCache(cache_path, ttl_seconds=ROUTE_TTL_HOURS * 3600, max_entries=ROUTE_CACHE_MAX_ENTRIES)
+
+
+@st.cache_resource
+def start_precomputer():
+    return Precomputer(
+        route_cache, precompute_route, modes=list(MODES), top_n=PRECOMPUTE_TOP_N,
+        interval_seconds=PRECOMPUTE_INTERVAL_MINUTES * 60,
+        min_requests=PRECOMPUTE_MIN_REQUESTS, active_seconds=PRECOMPUTE_ACTIVE_HOURS * 3600,
+    ).start()
+
+
+# Per-mode requests run in parallel; one pool for the whole process
+@st.cache_resource
+def load_request_pool():
+    return ThreadPoolExecutor(max_workers=len(MODES) * 4, thread_name_prefix="travel-modes")
+
+
+# Images are decoded once per process instead of on every request
+@st.cache_resource
+def load_image(file_name):
+    try:
+        image = Image.open(os.path.join(APP_DIR, file_name))
+        image.load()
+        return image
+    except FileNotFoundError:
+        return None
+
+route_cache = load_route_cache()
+precomputer = start_precomputer() if api_key or is_fake_backend() else None
+request_pool = load_request_pool()
 
 # Load the image
-try:
-    image = Image.open("travel ai.png")  # Replace with your image path
-except FileNotFoundError:
-    image = None
+image = load_image("travel ai.png")  # Replace with your image path
+if image is None:
     st.warning("Please place travel_planner_image.png in the same directory.")
 
 # Title and image
@@ -33,46 +107,71 @@ source = st.text_input("Source", value="Hyderabad")
 destination = st.text_input("Destination", value="Pune")
 
 if st.button("Submit"):
-    if not api_key:
+    if not api_key and not is_fake_backend():
         st.error("Please set the GOOGLE_API_KEY environment variable.")
     else:
-        try:
-            # Correct model name and potential API version adjustment
-            chat_model = ChatGoogleGenerativeAI(
-                api_key=api_key,
-                model="gemini-1.5-pro"  # Or try "gemini-1.5-pro", or "gemini-flash"
-            )
-            chat_template = ChatPromptTemplate(
-                messages=[
-                    ("system", """You are a helpful AI assistant who provides detailed travel 
-                    information including modes of transport, estimated costs, and relevant company name, travel time. 
-                    Giving the result in table format, by mode of airways, railway, etc.
-                    For every company separate prices should be displayed, realtime."""),
-                    
-                    ("human", "Provide travel information from {source} to {destination}, including available modes of transport, estimated costs. while displaying brace should not be displayed.")
-                ],
-                partial_variables={}
-            )
-            parser = StrOutputParser()
-            chain = chat_template | chat_model | parser
-            raw_input = {"source": source, "destination": destination}
-            result = chain.invoke(raw_input)
-            st.write(result)
-
-            # Example logo handling (adjust based on Gemini output)
-            if "flight" in result.lower():
-                try:
-                    flight_logo = Image.open("flight_logo.png")
-                    st.image(flight_logo, width=50)
-                except FileNotFoundError:
-                    st.write("Flight logo not found")
-            if "train" in result.lower():
-                try:
-                    train_logo = Image.open("train_logo.png")
-                    st.image(train_logo, width=50)
-                except FileNotFoundError:
-                    st.write("Train logo not found")
-            # Add similar logic for other modes of transport
-
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
+        route_cache.log_request(source, destination)
+
+        # One section per mode, laid out up front and filled in as each response arrives
+        sections = {}
+        for mode, info in MODES.items():
+            header, body = st.columns([1, 12])
+            logo = load_image(info["icon"])
+            if logo is not None:
+                header.image(logo, width=50)
+            else:
+                header.markdown(f"## {info['emoji']}")
+            body.subheader(info["label"])
+            sections[mode] = body.empty()
+            sections[mode].caption("Looking up options...")
+
+        def render(mode, result, note=None):
+            """Show one mode's reply; returns whether it parsed as options."""
+            with sections[mode].container():
+                with tracing.span("travel.parse_options", mode=mode):
+                    options = parse_options(result)
+                if options is None:
+                    # Not the JSON we asked for: show the reply as text rather than nothing
+                    st.write(result)
+                elif options.empty:
+                    st.caption(f"No {MODES[mode]['label'].lower()} options found.")
+                else:
+                    st.dataframe(options, hide_index=True, use_container_width=True)
+                if note:
+                    st.caption(note)
+            return options is not None
+
+        started = time.perf_counter()
+        futures = {}
+        for mode in MODES:
+            with tracing.span("travel.cache_get", mode=mode):
+                cached = route_cache.get(source, destination, mode)
+            if cached is not None:
+                result, age = cached
+                render(mode, result, f"⚡ Served from cache (updated {age / 60:.0f} min ago)")
+            else:
+                futures[request_pool.submit(plan_route, source, destination, mode)] = mode
+
+        for future in as_completed(futures):
+            mode = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                sections[mode].error(f"An error occurred: {e}")
+                continue
+            # Unparsable replies are shown once but not cached, so the next request asks again
+            if render(mode, result, f"⏱️ {time.perf_counter() - started:.1f}s"):
+                route_cache.put(source, destination, result, mode)
+
+# Sidebar - Route cache statistics
+with st.sidebar.expander("⚡ Route cache"):
+    cache_stats = route_cache.stats()
+    st.caption(f"{cache_stats['entries']} cached routes, {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+               f"(TTL {ROUTE_TTL_HOURS:g}h)")
+    if precomputer is not None and precomputer.last_run is not None:
+        st.caption(f"Top {PRECOMPUTE_TOP_N} pairs (≥{PRECOMPUTE_MIN_REQUESTS} requests, last one within "
+                   f"{PRECOMPUTE_ACTIVE_HOURS:g}h) refreshed in the background; "
+                   f"{precomputer.refreshed} refreshes, last pass {(time.time() - precomputer.last_run) / 60:.0f} min ago")
+
+# Sidebar - Per-stage latency (GENAI_TRACE_PANEL=1)
+tracing.render_streamlit_panel()
@@ -0,0 +1,204 @@
+"""Shared route-result cache and popular-pair precomputation for the travel planner.
+
+- RouteCache: SQLite store of planner results keyed by normalized
+  (source, destination) and transport mode, with a TTL and least-recently-used eviction beyond
+  `max_entries`. It also keeps a log of requested pairs.
+- Precomputer: a daemon thread that periodically refreshes the top-N most
+  requested pairs from that log before they expire, so common lookups are
+  served from the cache. Only pairs asked for repeatedly and recently
+  qualify, so light traffic does not keep one-off routes regenerating.
+"""
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("travel.route_cache")
+
+# Old and colloquial names folded onto one spelling
+CITY_ALIASES = {
+    "bombay": "mumbai",
+    "bangalore": "bengaluru",
+    "blr": "bengaluru",
+    "madras": "chennai",
+    "calcutta": "kolkata",
+    "poona": "pune",
+    "gurgaon": "gurugram",
+    "trivandrum": "thiruvananthapuram",
+    "cochin": "kochi",
+    "baroda": "vadodara",
+    "benares": "varanasi",
+    "banaras": "varanasi",
+    "mysore": "mysuru",
+    "vizag": "visakhapatnam",
+    "hyd": "hyderabad",
+    "new delhi": "delhi",
+    "nyc": "new york",
+    "new york city": "new york",
+}
+
+
+def normalize_city(name):
+    """Case-, whitespace- and punctuation-insensitive city name with aliases folded."""
+    name = re.sub(r"[^\w\s]", " ", name.casefold())
+    name = " ".join(name.split())
+    # "Pune, India" and "Pune" are the same place
+    name = re.sub(r"\s+india$", "", name)
+    return CITY_ALIASES.get(name, name)
+
+
+def route_key(source, destination, mode=""):
+    key = f"{normalize_city(source)} -> {normalize_city(destination)}"
+    return f"{key} [{mode}]" if mode else key
+
+
+class RouteCache:
+    """SQLite-backed route results with TTL and LRU eviction, plus a request log."""
+
+    def __init__(self, path, ttl_seconds=6 * 3600, max_entries=2000, log_window_seconds=7 * 24 * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.log_window_seconds = log_window_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Streamlit sessions and the precompute thread share the connection; access is serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS routes (
+                key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                destination TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS requests (key TEXT NOT NULL, source TEXT NOT NULL, destination TEXT NOT NULL, ts REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS requests_ts ON requests(ts)")
+        self._conn.commit()
+
+    def get(self, source, destination, mode=""):
+        """Return (result, age in seconds) for a fresh entry, or None."""
+        now = time.time()
+        key = route_key(source, destination, mode)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created FROM routes WHERE key = ? AND created > ?", (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE routes SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0], now - row[1]
+
+    def age(self, source, destination, mode=""):
+        """Seconds since the entry was computed, or None when there is no entry."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created FROM routes WHERE key = ?", (route_key(source, destination, mode),)
+            ).fetchone()
+        return time.time() - row[0] if row else None
+
+    def put(self, source, destination, result, mode=""):
+        """Store a result and evict expired entries and the least recently used beyond `max_entries`."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO routes (key, source, destination, result, created, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (route_key(source, destination, mode), source, destination, result, now, now),
+            )
+            self._conn.execute("DELETE FROM routes WHERE created <= ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM routes WHERE key IN (SELECT key FROM routes ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def log_request(self, source, destination):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO requests (key, source, destination, ts) VALUES (?, ?, ?, ?)",
+                (route_key(source, destination), source.strip(), destination.strip(), now),
+            )
+            self._conn.execute("DELETE FROM requests WHERE ts <= ?", (now - self.log_window_seconds,))
+            self._conn.commit()
+
+    def popular_pairs(self, top_n=20, min_requests=1, active_seconds=None):
+        """The most requested pairs in the log window as (source, destination, count), most requested first.
+
+        Pairs need at least `min_requests` requests in the window and, with `active_seconds`, one that recent.
+        """
+        now = time.time()
+        with self._lock:
+            return self._conn.execute(
+                """SELECT source, destination, COUNT(*) AS requests FROM requests
+                   WHERE ts > ? GROUP BY key HAVING requests >= ? AND MAX(ts) > ?
+                   ORDER BY requests DESC LIMIT ?""",
+                (now - self.log_window_seconds, min_requests,
+                 now - active_seconds if active_seconds is not None else 0, top_n),
+            ).fetchall()
+
+    def stats(self):
+        """Entry count and hit/miss counters."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+
+class Precomputer:
+    """Refreshes the most requested pairs in the background before their cache entries expire."""
+
+    def __init__(self, cache, plan_route, modes=("",), top_n=20, interval_seconds=1800, refresh_after=0.75,
+                 min_requests=3, active_seconds=24 * 3600):
+        self.cache = cache
+        self.plan_route = plan_route  # (source, destination, mode) -> result text
+        self.modes = modes
+        self.top_n = top_n
+        # Pairs asked for fewer times, or not within active_seconds, are left to expire
+        self.min_requests = min_requests
+        self.active_seconds = active_seconds
+        self.interval_seconds = interval_seconds
+        # Entries older than this fraction of the TTL are recomputed
+        self.refresh_after = refresh_after
+        self.last_run = None
+        self.refreshed = 0
+        self._thread = threading.Thread(target=self._loop, name="route-precompute", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def run_once(self):
+        refreshed = 0
+        for source, destination, _ in self.cache.popular_pairs(self.top_n, self.min_requests, self.active_seconds):
+            for mode in self.modes:
+                age = self.cache.age(source, destination, mode)
+                if age is not None and age < self.cache.ttl_seconds * self.refresh_after:
+                    continue
+                try:
+                    self.cache.put(source, destination, self.plan_route(source, destination, mode), mode)
+                    refreshed += 1
+                except Exception as e:
+                    logger.warning("Precomputing %s -> %s (%s) failed: %s", source, destination, mode or "all modes", e)
+        self.last_run = time.time()
+        self.refreshed += refreshed
+        logger.info("Precompute pass refreshed %d popular routes", refreshed)
+        return refreshed
+
+    def _loop(self):
+        while True:
+            # One failed pass (a locked database, say) must not end the thread for the life of the process
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Precompute pass failed; retrying in %.0fs", self.interval_seconds)
+            time.sleep(self.interval_seconds)
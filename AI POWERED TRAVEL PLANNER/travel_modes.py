@@ -0,0 +1,77 @@
+"""Per-transport-mode planner queries with structured JSON results.
+
+Each mode (air, rail, road/bus) gets its own small prompt that asks for a
+JSON array of options. The modes are requested concurrently, so the first
+table can render while the others are still being generated. `parse_options`
+turns a reply into a pandas DataFrame.
+"""
+import json
+import re
+
+import pandas as pd
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+MODES = {
+    "air": {"label": "Airways", "icon": "flight_logo.png", "emoji": "✈️",
+            "services": "flights (airline, flight number or route, direct or with stops)"},
+    "rail": {"label": "Railways", "icon": "train_logo.png", "emoji": "🚆",
+             "services": "trains (operator, train name and number, class options)"},
+    "road": {"label": "Road / Bus", "icon": "bus_logo.png", "emoji": "🚌",
+             "services": "buses, shared cabs and self-drive (operator, bus type or vehicle)"},
+}
+
+COLUMNS = ["operator", "service", "departure", "duration", "price_min", "price_max", "currency", "notes"]
+COLUMN_LABELS = {
+    "operator": "Company", "service": "Service", "departure": "Departures", "duration": "Travel time",
+    "price_min": "Min price", "price_max": "Max price", "currency": "Currency", "notes": "Notes",
+}
+
+mode_template = ChatPromptTemplate.from_messages([
+    ("system", """You are a helpful AI assistant who provides travel information for one mode of transport.
+Reply with only a JSON array, no prose and no code fences. Each element is one option with these keys:
+"operator" (company name), "service", "departure" (typical departure times), "duration" (e.g. "2h 10m"),
+"price_min" and "price_max" (numbers, estimated one-way fare), "currency" (ISO code), "notes".
+Give separate entries for every company. Reply with [] if this mode does not connect the two places."""),
+    ("human", "List {services} from {source} to {destination}."),
+])
+
+
+def build_mode_chain(model):
+    return mode_template | model | StrOutputParser()
+
+
+def mode_inputs(source, destination, mode):
+    return {"source": source, "destination": destination, "services": MODES[mode]["services"]}
+
+
+def parse_price(value):
+    """A fare as a float, tolerating thousands separators and currency symbols ("3,500", "₹3500"); NaN otherwise."""
+    if isinstance(value, str):
+        numbers = re.findall(r"-?\d+(?:\.\d+)?", value.replace(",", ""))
+        # Ranges and other multi-number strings are ambiguous, so they are left blank
+        return float(numbers[0]) if len(numbers) == 1 else float("nan")
+    return value
+
+
+def parse_options(text):
+    """DataFrame of options from a JSON reply (tolerating code fences and surrounding prose); None if unparsable.
+
+    A non-empty array without any option objects counts as unparsable, so only a literal [] means "no options".
+    """
+    match = re.search(r"\[.*\]", text, re.DOTALL)
+    if match is None:
+        return None
+    try:
+        options = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(options, list):
+        return None
+    rows = [o for o in options if isinstance(o, dict)]
+    if options and not rows:
+        return None
+    frame = pd.DataFrame(rows, columns=COLUMNS)
+    for column in ("price_min", "price_max"):
+        frame[column] = pd.to_numeric(frame[column].map(parse_price), errors="coerce")
+    return frame.rename(columns=COLUMN_LABELS)
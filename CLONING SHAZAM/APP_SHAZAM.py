@@ -1,12 +1,28 @@
+import time
+_imports_started = time.perf_counter()
+import logging
 import streamlit as st
 import pandas as pd
-from sentence_transformers import SentenceTransformer
-import chromadb
-import re
+import numpy as np
 import os
-import whisper
-import tempfile
-import moviepy.editor as mp
+from concurrent.futures import ThreadPoolExecutor
+from audio_decoding import SAMPLE_RATE as WHISPER_SAMPLE_RATE, decode_upload
+from fingerprint import FingerprintIndex
+from lexical_index import BM25Index
+from shazam_pipeline import (
+    WHISPER_MODEL_NAME, SubtitleSearcher, load_collection, load_encoder, load_whisper_model,
+    stream_transcription, transcribe,
+)
+from genai_common import tracing  # the repo root is put on sys.path by shazam_pipeline
+from shazam_cache import EmbeddingCache, TranscriptCache, audio_cache_key
+from warmup import LazyResource, start_warmup
+from vad import trim_silence
+# torch (via whisper / sentence-transformers) and chromadb are imported inside the pipeline loaders
+IMPORT_SECONDS = time.perf_counter() - _imports_started
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+# Stage timings go to traces/shazam.jsonl (and /metrics when GENAI_METRICS_PORT is set)
+tracing.configure("shazam")
 
 # Streamlit app title and description
 st.title("🎵 Shazam Clone: Audio/Video Subtitle Search")
@@ -15,139 +31,227 @@ st.markdown("""
     This app mimics Shazam by identifying audio content and linking it to relevant subtitles.
 """)
 
-# Step 1: Initialize Model and ChromaDB Collection (Cached for Performance)
+# Inference backend: "torch" (default) or "onnx" (int8-quantized ONNX Runtime, see onnx_backend.py)
+INFERENCE_BACKEND = os.environ.get("SHAZAM_INFERENCE_BACKEND", "torch").lower()
+
+# Search backend: "chroma" (PersistentClient) or "numpy" (memory-mapped export from vector_index.py)
+SEARCH_BACKEND = os.environ.get("SHAZAM_SEARCH_BACKEND", "chroma").lower()
+
+# Step 1: Model and ChromaDB Collection (loaded once per process, in the background)
 @st.cache_resource
-def load_model_and_collection():
+def load_resources():
+    """Create the process-wide model resources and warm them up on a background thread."""
+    encoder = LazyResource("sentence encoder", lambda: load_encoder(INFERENCE_BACKEND))
+    collection = LazyResource(
+        "subtitle collection", lambda: load_collection(SEARCH_BACKEND, index_path=os.environ.get("SHAZAM_INDEX_DIR"))
+    )
+    whisper_model = LazyResource("Whisper", lambda: load_whisper_model(WHISPER_MODEL_NAME, INFERENCE_BACKEND))
+    # One dummy inference each, so the first real request does not pay for lazy initialization
+    warmup = start_warmup([
+        (encoder, lambda m: m.encode(["warm up"], show_progress_bar=False)),
+        (collection, lambda c: c[0].query(query_embeddings=[encoder.get().encode(["warm up"], show_progress_bar=False)[0].tolist()], n_results=1)),
+        (whisper_model, lambda m: m.transcribe(np.zeros(WHISPER_SAMPLE_RATE, dtype=np.float32), fp16=False)),
+    ], timings={"app imports": IMPORT_SECONDS})
+    return encoder, collection, whisper_model, warmup
+
+encoder_resource, collection_resource, whisper_resource, warmup = load_resources()
+
+def get_model():
+    return encoder_resource.get()
+
+def get_collection():
+    return collection_resource.get()[0]
+
+# Readiness indicator: the page renders right away while models load in the background
+with st.sidebar.expander("🚦 Model status", expanded=not warmup.done.is_set()):
+    for resource in (encoder_resource, collection_resource, whisper_resource):
+        icon = {"ready": "✅", "loading": "⏳", "failed": "❌"}[resource.status]
+        loaded_in = f" in {resource.seconds:.1f}s" if resource.seconds is not None else ""
+        st.write(f"{icon} {resource.name}: {resource.status}{loaded_in}")
+    if warmup.done.is_set():
+        st.caption(" · ".join(f"{phase}: {seconds:.2f}s" for phase, seconds in warmup.timings.items()))
+    else:
+        st.button("Refresh status")
+
+if collection_resource.status == "failed":
+    # A failed load is retried on the next rerun
     try:
-        model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
-        # In Hugging Face Spaces, chroma.sqlite3 is in the same directory as this script
-        persist_path = os.path.dirname(os.path.abspath(__file__))
-        
-        # Check if chroma.sqlite3 exists
-        db_path = os.path.join(persist_path, "chroma.sqlite3")
-        if not os.path.exists(db_path):
-            raise FileNotFoundError(f"ChromaDB database file not found at: {db_path}")
-        
-        client = chromadb.PersistentClient(path=persist_path)
-        # Verify the collection exists
-        collections = client.list_collections()
-        collection_names = [col.name for col in collections]
-        if "subtitle_embeddings" not in collection_names:
-            raise ValueError(f"Collection 'subtitle_embeddings' not found in ChromaDB. Available collections: {collection_names}")
-        
-        collection = client.get_collection("subtitle_embeddings")
-        return model, collection, persist_path
+        collection_resource.get()
     except Exception as e:
-        raise Exception(f"Error loading model or collection: {str(e)}")
-
-try:
-    model, collection, persist_path = load_model_and_collection()
-    st.success(f"Loaded collection 'subtitle_embeddings' from: {persist_path}")
+        st.error(f"Failed to load collection: {e}")
+        st.stop()
+if collection_resource.loaded:
+    collection, persist_path = collection_resource.get()
+    st.success(f"Loaded collection 'subtitle_embeddings' ({SEARCH_BACKEND} backend) from: {persist_path}")
     st.write(f"Total chunks in collection: {collection.count()}")
-except Exception as e:
-    st.error(f"Failed to load collection: {e}")
-    st.stop()
-
-# Step 2: Query Preprocessing Function
-def preprocess_query(query):
-    """Clean and preprocess the query to match subtitle cleaning."""
-    query = re.sub(r'\d{2}:\d{2}:\d{2},\d{3}\s*-->\s*\d{2}:\d{2}:\d{2},\d{3}', '', query)
-    query = re.sub(r'^\d+\r?\n', '', query, flags=re.MULTILINE)
-    query = re.sub(r'\s+', ' ', query.strip())
-    query = re.sub(r'\[.*?\]|\(.*?\)', '', query)
-    query = re.sub(r'<.*?>', '', query)
-    return query.lower()
+else:
+    st.info("Loading the subtitle collection and models in the background. You can upload a file now.")
 
-# Step 3: Speech-to-Text Function using Whisper
+# Transcript and query-embedding caches, shared across sessions
 @st.cache_resource
-def load_whisper_model():
-    try:
-        if not hasattr(whisper, 'load_model'):
-            raise AttributeError("The 'whisper' module does not have a 'load_model' function. Ensure you have installed 'openai-whisper', not the 'whisper' package.")
-        return whisper.load_model("base")  # Use the 'base' model for better performance on CPU
-    except Exception as e:
-        raise Exception(f"Failed to load Whisper model: {str(e)}")
+def load_caches():
+    cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shazam_cache.sqlite3")
+    return TranscriptCache(cache_path, max_bytes=64 * 1024 * 1024), EmbeddingCache(max_bytes=32 * 1024 * 1024)
+
+transcript_cache, embedding_cache = load_caches()
 
-def extract_audio_from_video(video_file):
-    """Extract audio from a video file and save as a temporary WAV file."""
+# Step 3: Speech-to-Text Function using Whisper
+def load_audio_samples(uploaded_file):
+    """Decode an uploaded audio/video file in memory into 16 kHz mono float32 samples."""
     try:
-        # Save the video file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_video_file:
-            temp_video_file.write(video_file.read())
-            temp_video_path = temp_video_file.name
-
-        # Extract audio using moviepy
-        video = mp.VideoFileClip(temp_video_path)
-        audio = video.audio
-        temp_audio_path = temp_video_path.replace(".mp4", ".wav")
-        audio.write_audiofile(temp_audio_path)
-        audio.close()
-        video.close()
-        
-        # Clean up the temporary video file
-        os.unlink(temp_video_path)
-        return temp_audio_path
+        with tracing.span("shazam.decode"):
+            return decode_upload(uploaded_file, sample_rate=WHISPER_SAMPLE_RATE)
     except Exception as e:
-        raise Exception(f"Error extracting audio from video: {e}")
+        raise Exception(f"Error decoding audio: {e}")
 
-def audio_to_text(audio_file, file_type):
-    """Convert audio file (or audio extracted from video) to text using Whisper."""
+def audio_to_text(samples):
+    """Convert decoded audio samples to text using Whisper."""
     try:
-        # Load Whisper model
-        whisper_model = load_whisper_model()
-        
-        # If the file is a video, extract audio first
-        if file_type in ["video/mp4"]:
-            temp_audio_path = extract_audio_from_video(audio_file)
-        else:
-            # Save the audio file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_file:
-                temp_file.write(audio_file.read())
-                temp_audio_path = temp_file.name
-
-        # Transcribe the audio
-        result = whisper_model.transcribe(temp_audio_path, fp16=False)  # Disable FP16 for CPU compatibility
-        text = result["text"].strip()
-        
-        # Clean up the temporary audio file
-        os.unlink(temp_audio_path)
-        
+        text = transcribe(whisper_resource.get(), samples)
+
         # Check if the transcription is empty or meaningless
         if not text or text.isspace():
             return "Transcription resulted in empty text. The audio may not contain recognizable speech or lyrics."
         return text
     except Exception as e:
         return f"Error processing audio with Whisper: {str(e)}"
-    finally:
-        # Ensure the temporary file is deleted even if an error occurs
-        if 'temp_audio_path' in locals() and os.path.exists(temp_audio_path):
-            os.unlink(temp_audio_path)
+
+def is_confident_match(results, margin=0.1, min_score=0.3):
+    """Return True once the top match is clearly ahead of the best match from any other title.
+
+    Judged on the 'Confidence' column (dense cosine, or the BM25 score of a decisive keyword
+    hit), which the margin was tuned for, rather than on rank-fused display scores.
+    """
+    if results.empty:
+        return False
+    score = results['Confidence'] if 'Confidence' in results else results['Similarity Score']
+    top_name = results['Name'].iloc[0]
+    top_score = score[results['Name'] == top_name].max()
+    if top_score < min_score:
+        return False
+    others = score[results['Name'] != top_name]
+    if others.empty:
+        return True
+    return top_score - others.max() >= margin
+
+def transcript_html(text):
+    """Render extracted text in the styled transcript box."""
+    return f"""
+                <div style="background-color: #f0f2f6; padding: 15px; border-radius: 10px; border: 1px solid #d1d5db;">
+                    <p style="font-size: 16px; color: #333;">{text}</p>
+                </div>
+                """
 
 # Step 4: Search Function
+# Optional BM25 index over the same chunks, built by lexical_index.py (or ingest_subtitles.py)
+LEXICAL_INDEX_PATH = os.environ.get(
+    "SHAZAM_LEXICAL_INDEX", os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexical_index")
+)
+
+@st.cache_resource
+def load_lexical_index():
+    if not os.path.exists(os.path.join(LEXICAL_INDEX_PATH, "vocab.json")):
+        return None
+    return BM25Index(LEXICAL_INDEX_PATH)
+
+@st.cache_resource
+def load_search_pool():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="dense-search")
+
+lexical_index = load_lexical_index()
+search_pool = load_search_pool()
+
+searcher = SubtitleSearcher(get_model, get_collection, lexical_index, embedding_cache, search_pool)
+
 def search_subtitles(query, top_k=5):
-    """Retrieve top_k subtitle chunks matching the query using semantic search."""
+    """Retrieve top_k subtitle chunks matching the query (hybrid BM25 + semantic when available)."""
     try:
-        cleaned_query = preprocess_query(query)
-        query_embedding = model.encode([cleaned_query], show_progress_bar=False)[0]
-        results = collection.query(
-            query_embeddings=[query_embedding.tolist()],
-            n_results=top_k,
-            include=["documents", "metadatas", "distances"]
-        )
-        retrieved_results = []
-        for doc, metadata, distance in zip(results['documents'][0], results['metadatas'][0], results['distances'][0]):
-            retrieved_results.append({
-                'Num': metadata['num'],
-                'Name': metadata['name'],
-                'Subtitle Chunk': doc,
-                'Similarity Score': round(1 - distance, 3)
-            })
-        return pd.DataFrame(retrieved_results)
+        retrieved_results = searcher.search(query, top_k, mode=search_mode, race_dense=race_dense)
+        return pd.DataFrame(
+            [{key: value for key, value in r.items() if key != 'id'} for r in retrieved_results],
+            columns=['Num', 'Name', 'Subtitle Chunk', 'Similarity Score', 'Confidence']
+        ) if retrieved_results else pd.DataFrame()
     except Exception as e:
         st.error(f"Error during search: {e}")
         return pd.DataFrame()
 
-# Step 5: File Upload and Processing
+# Optional fast path: reference fingerprints built offline with fingerprint.py
+FINGERPRINT_PATH = os.environ.get(
+    "SHAZAM_FINGERPRINTS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fingerprints.npz")
+)
+
+@st.cache_resource
+def load_fingerprint_index():
+    if not os.path.exists(FINGERPRINT_PATH):
+        return None
+    return FingerprintIndex.load(FINGERPRINT_PATH)
+
+fingerprint_index = load_fingerprint_index()
+
+def subtitles_for_match(match, top_k=5):
+    """Subtitle chunks of a fingerprinted title, nearest to the matched offset first."""
+    try:
+        found = get_collection().get(where={"name": match.name}, include=["documents", "metadatas"])
+        rows = []
+        for doc, metadata in zip(found['documents'], found['metadatas']):
+            # Chunks ingested with timing are ordered by distance from the match offset, others by position
+            start = metadata.get('start')
+            rows.append((
+                abs(start - match.offset_seconds) if start is not None else metadata.get('chunk', 0),
+                {
+                    'Num': metadata['num'],
+                    'Name': metadata['name'],
+                    'Subtitle Chunk': doc,
+                    'Similarity Score': round(match.votes / max(match.query_hashes, 1), 3)
+                }
+            ))
+        rows.sort(key=lambda row: row[0])
+        return pd.DataFrame([row for _, row in rows[:top_k]])
+    except Exception as e:
+        st.error(f"Error fetching subtitles for fingerprint match: {e}")
+        return pd.DataFrame()
+
+# Step 5: Options (defined before processing so the values apply to this run)
+st.sidebar.header("⚙️ Options")
+top_k = st.sidebar.slider("Number of results to display", min_value=1, max_value=10, value=5)
+st.sidebar.markdown("Adjust the number of subtitle chunks returned by the search.")
+streaming_mode = st.sidebar.checkbox(
+    "Streaming mode",
+    value=True,
+    help="Transcribe in short windows and stop as soon as one title clearly leads the search results."
+)
+window_seconds = st.sidebar.slider("Streaming window (seconds)", min_value=3, max_value=30, value=5, disabled=not streaming_mode)
+confidence_margin = st.sidebar.slider("Early-exit score margin", min_value=0.02, max_value=0.5, value=0.1, step=0.02, disabled=not streaming_mode)
+
+search_mode = st.sidebar.radio(
+    "Search mode",
+    ["Hybrid", "Dense"],
+    index=0 if lexical_index is not None else 1,
+    disabled=lexical_index is None,
+    horizontal=True,
+    help="Hybrid fuses BM25 keyword search with semantic search and answers exact quotes from keywords alone."
+)
+race_dense = st.sidebar.checkbox(
+    "Run keyword and semantic search in parallel",
+    value=True,
+    disabled=lexical_index is None or search_mode != "Hybrid",
+    help="Lower latency when keywords are inconclusive, at the cost of encoding even when a keyword hit makes it unnecessary. "
+         "Turn off to save CPU on busy hosts."
+)
+use_vad = st.sidebar.checkbox(
+    "Skip silence and instrumental music before transcription (VAD)",
+    value=True,
+    help="Detect speech from energy, spectral shape and syllable-rate modulation and send only those regions to Whisper. "
+         "Sung vocals are kept; strongly percussive music may be kept too."
+)
+use_fingerprint = st.sidebar.checkbox(
+    "Audio fingerprint fast path",
+    value=fingerprint_index is not None,
+    disabled=fingerprint_index is None,
+    help="Match the audio against reference fingerprints first and only run Whisper when that match is not confident."
+)
+
+# Step 6: File Upload and Processing
 st.header("📤 Upload Audio or Video File")
 with st.container():
     uploaded_file = st.file_uploader(
@@ -163,59 +267,141 @@ if uploaded_file is not None:
         st.write(f"**File Name**: {uploaded_file.name}")
         st.write(f"**File Type**: {uploaded_file.type}")
         
-        # Save file temporarily for processing
+        # Display the file for playback
+        if uploaded_file.type in ["audio/mpeg", "audio/wav"]:
+            st.audio(uploaded_file)
+        elif uploaded_file.type == "video/mp4":
+            st.video(uploaded_file)
+
+    # Decode the upload once, in memory, for whichever transcription mode runs below
+    with st.spinner("Decoding audio..."):
         try:
-            file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), uploaded_file.name)
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            st.success(f"File saved temporarily at: {file_path}")
-            
-            # Display the file for playback
-            if uploaded_file.type in ["audio/mpeg", "audio/wav"]:
-                st.audio(uploaded_file)
-            elif uploaded_file.type == "video/mp4":
-                st.video(uploaded_file)
+            samples = load_audio_samples(uploaded_file)
         except Exception as e:
-            st.error(f"Failed to save or display file: {e}")
+            st.error(f"Failed to decode the uploaded file: {e}")
             st.stop()
 
-    # Extract text from audio
-    st.header("🗣️ Extracted Text from Audio")
-    with st.container():
-        with st.spinner("Extracting spoken content from audio..."):
-            extracted_text = audio_to_text(uploaded_file, uploaded_file.type)
-        
-        # Display extracted text in a styled box
-        if extracted_text and not extracted_text.startswith("Error processing audio") and not extracted_text.startswith("Transcription resulted in empty text"):
-            st.markdown(
-                f"""
-                <div style="background-color: #f0f2f6; padding: 15px; border-radius: 10px; border: 1px solid #d1d5db;">
-                    <p style="font-size: 16px; color: #333;">{extracted_text}</p>
-                </div>
-                """,
-                unsafe_allow_html=True
+    # Fast path: identify the audio by fingerprint before paying for Whisper
+    fingerprint_match = None
+    if use_fingerprint and fingerprint_index is not None:
+        with st.spinner("Matching audio fingerprint..."):
+            with tracing.span("shazam.fingerprint_match"):
+                fingerprint_match = fingerprint_index.match(samples)
+    fingerprint_hit = fingerprint_match is not None and fingerprint_match.is_confident()
+
+    if not fingerprint_hit:
+        # Identical audio transcribed before is served from the transcript cache
+        # The quantized backend can transcribe slightly differently, so it gets its own cache entries
+        transcript_key = audio_cache_key(samples, f"{WHISPER_MODEL_NAME}:{INFERENCE_BACKEND}:{'vad' if use_vad else 'full'}")
+        cached_text = transcript_cache.get(transcript_key)
+
+        # Only voiced regions, packed together, are sent to Whisper
+        speech_samples = samples
+        if use_vad and cached_text is None:
+            with tracing.span("shazam.vad"):
+                speech_samples, vad_report = trim_silence(samples)
+            st.caption(
+                f"🔇 Voice activity detection skipped {vad_report.skipped_fraction:.0%} of the audio "
+                f"({vad_report.kept_seconds:.1f}s of {vad_report.total_seconds:.1f}s kept in {len(vad_report.segments)} segments)."
             )
-        else:
-            st.error(f"Failed to extract meaningful text from the audio: {extracted_text}")
-            st.info("This might happen if the audio is a song with heavy instrumentals, background noise, or unclear vocals. Try uploading an audio or video file with clear speech (e.g., a podcast, narration, or spoken dialogue).")
-            st.stop()
 
-    # Search for matching subtitles
-    st.header("🔍 Search Results")
-    with st.container():
-        with st.spinner("Searching for matching subtitles..."):
-            results = search_subtitles(extracted_text, top_k=5)
-        
-        if not results.empty:
-            st.write("Here are the top matching subtitle chunks from the database:")
-            st.dataframe(results, use_container_width=True)
-        else:
-            st.warning("No matching subtitle chunks found for the extracted text.")
+    if fingerprint_hit:
+        st.header("🎯 Fingerprint Match")
+        with st.container():
+            st.success(
+                f"Identified **{fingerprint_match.name}** at {fingerprint_match.offset_seconds:.1f}s "
+                f"({fingerprint_match.votes} aligned hashes vs {fingerprint_match.runner_up_votes} for the next title)."
+            )
+            results = subtitles_for_match(fingerprint_match, top_k=top_k)
+            if not results.empty:
+                st.write("Subtitle chunks around the matched position:")
+                st.dataframe(results, use_container_width=True)
+            else:
+                st.warning(f"No subtitle chunks stored for '{fingerprint_match.name}'.")
+    elif streaming_mode and cached_text is None:
+        # Transcribe window by window and search after each one, stopping early once confident
+        st.header("⚡ Streaming Search")
+        with st.container():
+            total_seconds = max(len(speech_samples) / WHISPER_SAMPLE_RATE, 1e-6)
+            progress = st.progress(0.0)
+            status = st.empty()
+            text_box = st.empty()
+            table = st.empty()
+            extracted_text = ""
+            results = pd.DataFrame()
+            try:
+                for seconds_done, extracted_text in stream_transcription(whisper_resource.get(), speech_samples, window_seconds):
+                    progress.progress(min(seconds_done / total_seconds, 1.0))
+                    status.info(f"Processed {seconds_done:.1f}s of {total_seconds:.1f}s of audio...")
+                    if not extracted_text:
+                        continue
+                    text_box.markdown(transcript_html(extracted_text), unsafe_allow_html=True)
+                    # Fetch a few extra candidates so the lead over other titles can be judged
+                    results = search_subtitles(extracted_text, top_k=max(top_k, 5))
+                    if not results.empty:
+                        table.dataframe(results.drop(columns='Confidence').head(top_k), use_container_width=True)
+                    if is_confident_match(results, margin=confidence_margin):
+                        progress.progress(1.0)
+                        status.success(f"Confident match after {seconds_done:.1f}s of {total_seconds:.1f}s of audio.")
+                        break
+                else:
+                    if extracted_text:
+                        # Only complete transcripts are cached; early exits leave the tail untranscribed
+                        transcript_cache.put(transcript_key, extracted_text)
+                        status.info("Reached the end of the clip without a clear leader; showing the best matches.")
+            except Exception as e:
+                st.error(f"Error processing audio with Whisper: {e}")
+                st.stop()
 
-# Step 6: Additional Features
-st.sidebar.header("⚙️ Options")
-top_k = st.sidebar.slider("Number of results to display", min_value=1, max_value=10, value=5)
-st.sidebar.markdown("Adjust the number of subtitle chunks returned by the search.")
+            if not extracted_text:
+                status.empty()
+                st.error("Failed to extract meaningful text from the audio: Transcription resulted in empty text.")
+                st.info("This might happen if the audio is a song with heavy instrumentals, background noise, or unclear vocals. Try uploading an audio or video file with clear speech (e.g., a podcast, narration, or spoken dialogue).")
+                st.stop()
+            if results.empty:
+                st.warning("No matching subtitle chunks found for the extracted text.")
+    else:
+        # Extract text from audio
+        st.header("🗣️ Extracted Text from Audio")
+        with st.container():
+            with st.spinner("Extracting spoken content from audio..."):
+                extracted_text = cached_text if cached_text is not None else audio_to_text(speech_samples)
+
+            # Display extracted text in a styled box
+            if extracted_text and not extracted_text.startswith("Error processing audio") and not extracted_text.startswith("Transcription resulted in empty text"):
+                st.markdown(transcript_html(extracted_text), unsafe_allow_html=True)
+                if cached_text is not None:
+                    st.caption("Transcript served from cache.")
+                else:
+                    transcript_cache.put(transcript_key, extracted_text)
+            else:
+                st.error(f"Failed to extract meaningful text from the audio: {extracted_text}")
+                st.info("This might happen if the audio is a song with heavy instrumentals, background noise, or unclear vocals. Try uploading an audio or video file with clear speech (e.g., a podcast, narration, or spoken dialogue).")
+                st.stop()
+
+        # Search for matching subtitles
+        st.header("🔍 Search Results")
+        with st.container():
+            with st.spinner("Searching for matching subtitles..."):
+                results = search_subtitles(extracted_text, top_k=top_k)
+
+            if not results.empty:
+                st.write("Here are the top matching subtitle chunks from the database:")
+                st.dataframe(results.drop(columns='Confidence'), use_container_width=True)
+            else:
+                st.warning("No matching subtitle chunks found for the extracted text.")
+
+# Cache statistics (rendered last so they include this run)
+st.sidebar.header("🗄️ Cache")
+for label, cache in [("Transcripts", transcript_cache), ("Query embeddings", embedding_cache)]:
+    stats = cache.stats()
+    st.sidebar.markdown(
+        f"**{label}**: {stats['hits']} hits / {stats['misses']} misses · "
+        f"{stats['entries']} entries ({stats['bytes'] / 1024:.0f} KiB)"
+    )
+
+# Sidebar - Per-stage latency (GENAI_TRACE_PANEL=1)
+tracing.render_streamlit_panel()
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,106 @@
+"""In-memory audio decoding for the Shazam clone.
+
+Uploaded bytes are piped through a local ffmpeg process straight into a
+16 kHz mono float32 NumPy buffer, which Whisper accepts directly, so the
+common path never touches the disk.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+import numpy as np
+
+# Whisper works on 16 kHz mono samples
+SAMPLE_RATE = 16000
+
+
+def find_ffmpeg():
+    """Locate an ffmpeg binary: PATH first, then the one bundled with imageio-ffmpeg (a moviepy dependency)."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        return ffmpeg
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        raise FileNotFoundError("ffmpeg was not found. Install ffmpeg or imageio-ffmpeg to decode uploads.")
+
+
+def _run_ffmpeg(source, data=None, sample_rate=SAMPLE_RATE):
+    """Run ffmpeg on `source` (a path or 'pipe:0') and collect raw f32le samples from its stdout."""
+    cmd = [
+        find_ffmpeg(), "-hide_banner", "-loglevel", "error",
+        "-i", source,
+        "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "f32le", "pipe:1",
+    ]
+    if data is None:
+        cmd.insert(1, "-nostdin")
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if data is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    # Feed stdin and drain stderr on helper threads so none of the three pipes can deadlock
+    def feed():
+        try:
+            proc.stdin.write(data)
+        except (BrokenPipeError, OSError):
+            pass  # ffmpeg stopped reading; its exit code explains why
+        finally:
+            proc.stdin.close()
+
+    errors = []
+    threads = [threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)]
+    if data is not None:
+        threads.append(threading.Thread(target=feed, daemon=True))
+    for thread in threads:
+        thread.start()
+
+    # A bytearray keeps the resulting NumPy view writable without an extra copy
+    buffer = bytearray()
+    while True:
+        chunk = proc.stdout.read(1 << 16)
+        if not chunk:
+            break
+        buffer += chunk
+    proc.wait()
+    for thread in threads:
+        thread.join()
+
+    if proc.returncode != 0:
+        message = b"".join(errors).decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"ffmpeg failed to decode audio: {message or f'exit code {proc.returncode}'}")
+    usable = len(buffer) - len(buffer) % 4
+    return np.frombuffer(buffer, dtype=np.float32, count=usable // 4)
+
+
+def decode_audio_bytes(data, suffix=".mp3", sample_rate=SAMPLE_RATE):
+    """Decode audio or video bytes into a mono float32 array at `sample_rate`.
+
+    MP4 files whose index (moov atom) sits at the end cannot be parsed from a
+    non-seekable pipe; for those, the bytes are written to a single temp file
+    and ffmpeg reads it from there.
+    """
+    try:
+        return _run_ffmpeg("pipe:0", data=data, sample_rate=sample_rate)
+    except RuntimeError:
+        if suffix.lower() not in (".mp4", ".m4a", ".mov"):
+            raise
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        temp_file.write(data)
+        temp_path = temp_file.name
+    try:
+        return _run_ffmpeg(temp_path, sample_rate=sample_rate)
+    finally:
+        os.unlink(temp_path)
+
+
+def decode_upload(uploaded_file, sample_rate=SAMPLE_RATE):
+    """Decode a Streamlit UploadedFile without copying its contents."""
+    suffix = os.path.splitext(uploaded_file.name)[1] or ".mp3"
+    return decode_audio_bytes(uploaded_file.getbuffer(), suffix=suffix, sample_rate=sample_rate)
@@ -0,0 +1,367 @@
+"""Offline stage-level benchmark for the Shazam clone pipeline.
+
+Generates its own fixtures:
+    - synthetic tone and speech-like audio (real speech via espeak-ng when installed)
+    - mp4 files of several lengths muxed with ffmpeg
+    - a subtitle corpus of configurable size (10k-1M chunks) as a memory-mapped
+      vector index with random unit embeddings plus a BM25 index over the text
+
+and times each stage without Streamlit: decode, vad, fingerprint, transcribe,
+preprocess, encode and vector search. Each stage reports p50/p95 latency,
+throughput and peak RSS as JSON, so runs can be compared across commits.
+
+Usage:
+    python benchmark.py --chunks 100000 --out bench.json
+    python benchmark.py --whisper --encoder --chroma   # include model and Chroma stages
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+import numpy as np
+
+from audio_decoding import SAMPLE_RATE, decode_audio_bytes, find_ffmpeg
+from fingerprint import FingerprintIndex
+from lexical_index import BM25Index, build_lexical_index
+from shazam_pipeline import load_encoder, load_whisper_model, transcribe
+from genai_common.tracing import rss_bytes  # the repo root is put on sys.path by shazam_pipeline
+from subtitle_text import preprocess_query
+from vad import trim_silence
+from vector_index import MmapVectorIndex, write_strings
+
+EMBEDDING_DIM = 384
+
+WORDS = (
+    "the you i to a it and that of is in what we me this he for my on have your do was no be not can with "
+    "all but just are know like get here they so go there now one want gonna got right out come think see "
+    "yeah up well oh about let look did how at if why sure back time never take love tell man good where "
+    "something them going okay from could would really need said down thing mean make say over life night "
+    "baby heart world dream fire light dance remember forever tonight rain road home again away darkness"
+).split()
+
+
+# --- Measurement --------------------------------------------------------------------
+
+class RssSampler:
+    """Samples this process's resident set size on a background thread; tracks the peak in MiB."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+
+    def _rss_mb(self):
+        return rss_bytes() / 2 ** 20
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self._rss_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss_mb())
+
+
+def run_stage(name, fn, items, repeats=1, units=None, unit_name=None):
+    """Time fn(item) for every item, `repeats` times; returns the stage's JSON record."""
+    latencies = []
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        for _ in range(repeats):
+            for item in items:
+                t0 = time.perf_counter()
+                fn(item)
+                latencies.append(time.perf_counter() - t0)
+        wall = time.perf_counter() - started
+    latencies = np.asarray(latencies) * 1000
+    record = {
+        "calls": len(latencies),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "mean_ms": round(float(latencies.mean()), 3),
+        "throughput_per_s": round(len(latencies) / max(wall, 1e-9), 2),
+        # None where RSS cannot be read on this platform
+        "peak_rss_mb": round(rss.peak, 1) if rss.peak else None,
+    }
+    if units is not None:
+        # e.g. audio seconds processed per wall-clock second
+        record[f"{unit_name}_per_s"] = round(units * repeats / max(wall, 1e-9), 2)
+    print(f"  {name:<22} p50 {record['p50_ms']:>10.3f} ms  p95 {record['p95_ms']:>10.3f} ms  "
+          f"{record['throughput_per_s']:>10.2f}/s  rss {rss.peak:.0f} MiB", file=sys.stderr)
+    return record
+
+
+# --- Fixtures -------------------------------------------------------------------------
+
+def synth_tone(seconds, seed=0):
+    """Chord progression with a little noise: music-like, no speech."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    out = np.zeros_like(t)
+    for i, start in enumerate(np.arange(0, seconds, 0.5)):
+        mask = (t >= start) & (t < start + 0.5)
+        for f in rng.uniform(110, 880, size=3):
+            out[mask] += 0.2 * np.sin(2 * np.pi * f * t[mask])
+    return (out + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def synth_speech(seconds, seed=0):
+    """Speech audio: espeak-ng output when available, otherwise voiced syllable bursts with pauses."""
+    espeak = shutil.which("espeak-ng") or shutil.which("espeak")
+    rng = np.random.default_rng(seed)
+    if espeak:
+        words = " ".join(rng.choice(WORDS, size=int(seconds * 2.5)))
+        wav = subprocess.run([espeak, "--stdout", words], capture_output=True, check=True).stdout
+        samples = decode_audio_bytes(wav, suffix=".wav")
+        return np.resize(samples, int(seconds * SAMPLE_RATE)).astype(np.float32)
+
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    out = np.zeros_like(t)
+    position = 0.3
+    while position < seconds:
+        length = rng.uniform(0.12, 0.3)
+        mask = (t >= position) & (t < position + length)
+        pitch = rng.uniform(100, 220)
+        envelope = np.sin(np.pi * (t[mask] - position) / length)
+        for harmonic, weight in ((1, 1.0), (2, 0.6), (3, 0.4), (5, 0.2)):
+            out[mask] += 0.15 * weight * envelope * np.sin(2 * np.pi * pitch * harmonic * t[mask])
+        # Pauses between words and, now and then, between sentences
+        position += length + (rng.uniform(0.6, 1.2) if rng.random() < 0.1 else rng.uniform(0.02, 0.1))
+    return (out + 0.003 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def wav_bytes(samples):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+def make_mp4(samples, path):
+    """Mux samples under a tiny black video track."""
+    subprocess.run(
+        [
+            find_ffmpeg(), "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", "color=size=160x120:rate=10:color=black",
+            "-f", "wav", "-i", "pipe:0",
+            "-shortest", "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", path,
+        ],
+        input=wav_bytes(samples),
+        check=True,
+    )
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def random_chunk(rng, words=40):
+    return " ".join(rng.choice(WORDS, size=words))
+
+
+def build_corpus(out_dir, chunks, chunk_words=40, seed=0, block=100000):
+    """Write a vector index (random unit embeddings) and a BM25 index for `chunks` generated chunks."""
+    rng = np.random.default_rng(seed)
+    vector_dir = os.path.join(out_dir, "subtitle_index")
+    os.makedirs(vector_dir, exist_ok=True)
+    vectors = np.lib.format.open_memmap(
+        os.path.join(vector_dir, "embeddings.npy"), mode="w+", dtype=np.float32, shape=(chunks, EMBEDDING_DIM)
+    )
+    for start in range(0, chunks, block):
+        part = rng.standard_normal((min(block, chunks - start), EMBEDDING_DIM)).astype(np.float32)
+        vectors[start:start + len(part)] = part / np.linalg.norm(part, axis=1, keepdims=True)
+    vectors.flush()
+    del vectors
+
+    documents = [random_chunk(rng, chunk_words) for _ in range(chunks)]
+    ids = [f"bench_{i // 500}::{i % 500}" for i in range(chunks)]
+    names = [f"bench_{i // 500}" for i in range(chunks)]
+    nums = np.arange(chunks, dtype=np.int64) // 500
+    np.save(os.path.join(vector_dir, "num.npy"), nums)
+    for field, values in (("ids", ids), ("names", names), ("documents", documents)):
+        write_strings(os.path.join(vector_dir, field), values)
+    with open(os.path.join(vector_dir, "index.json"), "w") as f:
+        json.dump({"count": chunks, "dim": EMBEDDING_DIM, "space": "l2"}, f)
+
+    lexical_dir = os.path.join(out_dir, "lexical_index")
+    build_lexical_index(zip(ids, nums.tolist(), names, documents), lexical_dir)
+    return vector_dir, lexical_dir, documents
+
+
+def build_chroma(out_dir, vector_dir, batch=5000):
+    import chromadb
+
+    index = MmapVectorIndex(vector_dir)
+    client = chromadb.PersistentClient(path=os.path.join(out_dir, "chroma"))
+    collection = client.get_or_create_collection("subtitle_embeddings")
+    for start in range(0, index.count(), batch):
+        rows = range(start, min(start + batch, index.count()))
+        collection.add(
+            ids=[index.ids[i] for i in rows],
+            embeddings=index.embeddings[start:start + len(rows)].tolist(),
+            documents=[index.documents[i] for i in rows],
+            metadatas=[{"num": int(index.nums[i]), "name": index.names[i]} for i in rows],
+        )
+    return collection
+
+
+# --- Runner -----------------------------------------------------------------------------
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    fixtures_dir = args.fixtures_dir or tempfile.mkdtemp(prefix="shazam-bench-")
+    os.makedirs(fixtures_dir, exist_ok=True)
+    lengths = [float(x) for x in args.audio_lengths.split(",")]
+    stages = {}
+    skipped = {}
+
+    print(f"Generating fixtures in {fixtures_dir}", file=sys.stderr)
+    speech = [synth_speech(s, seed=i) for i, s in enumerate(lengths)]
+    tones = [synth_tone(s, seed=i) for i, s in enumerate(lengths)]
+    audio_seconds = sum(lengths)
+    encoded = [("wav", wav_bytes(x)) for x in speech]
+    try:
+        find_ffmpeg()
+        encoded += [("mp4", make_mp4(x, os.path.join(fixtures_dir, f"speech_{i}.mp4"))) for i, x in enumerate(speech)]
+        has_ffmpeg = True
+    except (FileNotFoundError, subprocess.CalledProcessError) as e:
+        has_ffmpeg = False
+        skipped["decode"] = f"ffmpeg unavailable: {e}"
+
+    started = time.perf_counter()
+    vector_dir, lexical_dir, documents = build_corpus(fixtures_dir, args.chunks, args.chunk_words)
+    print(f"Built {args.chunks}-chunk corpus in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    rng = np.random.default_rng(1)
+    # Queries quote the corpus with subtitle markup around them, like a transcribed clip would
+    queries = [
+        f"1\n00:00:01,000 --> 00:00:04,000\n[music] {' '.join(documents[i].split()[:12])} <i>(laughs)</i>"
+        for i in rng.integers(0, len(documents), args.queries)
+    ]
+    cleaned = [preprocess_query(q) for q in queries]
+    query_vectors = rng.standard_normal((args.queries, EMBEDDING_DIM)).astype(np.float32)
+
+    print("Running stages", file=sys.stderr)
+    if has_ffmpeg:
+        for kind in ("wav", "mp4"):
+            items = [data for k, data in encoded if k == kind]
+            suffix = f".{kind}"
+            stages[f"decode_{kind}"] = run_stage(
+                f"decode_{kind}", lambda data: decode_audio_bytes(data, suffix=suffix), items,
+                args.repeats, units=audio_seconds, unit_name="audio_seconds",
+            )
+    stages["vad"] = run_stage("vad", trim_silence, speech, args.repeats, units=audio_seconds, unit_name="audio_seconds")
+
+    fingerprint_index = FingerprintIndex.build((f"tone_{i}", x) for i, x in enumerate(tones))
+    clips = [x[len(x) // 3:len(x) // 3 + 5 * SAMPLE_RATE] for x in tones]
+    stages["fingerprint_match"] = run_stage("fingerprint_match", fingerprint_index.match, clips, args.repeats)
+
+    if args.whisper:
+        whisper_model = load_whisper_model(backend=args.inference_backend)
+        stages["transcribe"] = run_stage(
+            "transcribe", lambda x: transcribe(whisper_model, x), speech, 1,
+            units=audio_seconds, unit_name="audio_seconds",
+        )
+    else:
+        skipped["transcribe"] = "pass --whisper to include"
+
+    stages["preprocess"] = run_stage("preprocess", preprocess_query, queries, args.repeats)
+
+    if args.encoder:
+        encoder = load_encoder(args.inference_backend)
+        stages["encode"] = run_stage("encode", lambda q: encoder.encode([q], show_progress_bar=False), cleaned, args.repeats)
+    else:
+        skipped["encode"] = "pass --encoder to include"
+
+    vector_index = MmapVectorIndex(vector_dir)
+    stages["search_numpy"] = run_stage(
+        "search_numpy", lambda v: vector_index.query([v], n_results=5), query_vectors, args.repeats
+    )
+    batches = [query_vectors[i:i + 32] for i in range(0, len(query_vectors), 32)]
+    stages["search_numpy_batch32"] = run_stage(
+        "search_numpy_batch32", lambda b: vector_index.query(b, n_results=5), batches, args.repeats
+    )
+    bm25 = BM25Index(lexical_dir)
+    stages["search_bm25"] = run_stage("search_bm25", lambda q: bm25.search(q, 20), cleaned, args.repeats)
+
+    if args.chroma:
+        collection = build_chroma(fixtures_dir, vector_dir)
+        stages["search_chroma"] = run_stage(
+            "search_chroma",
+            lambda v: collection.query(query_embeddings=[v.tolist()], n_results=5,
+                                       include=["documents", "metadatas", "distances"]),
+            query_vectors, args.repeats,
+        )
+    else:
+        skipped["search_chroma"] = "pass --chroma to include"
+
+    if not args.fixtures_dir and not args.keep_fixtures:
+        shutil.rmtree(fixtures_dir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__,
+            "args": vars(args),
+        },
+        "stages": stages,
+        "skipped": skipped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Shazam pipeline stage by stage.")
+    parser.add_argument("--chunks", type=int, default=10000, help="Subtitle chunks in the generated corpus (10k-1M)")
+    parser.add_argument("--chunk-words", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--audio-lengths", default="5,30,120", help="Comma-separated fixture lengths in seconds")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--whisper", action="store_true", help="Include Whisper transcription")
+    parser.add_argument("--encoder", action="store_true", help="Include MiniLM query encoding")
+    parser.add_argument("--chroma", action="store_true", help="Include Chroma search (builds a collection of --chunks)")
+    parser.add_argument("--inference-backend", choices=["torch", "onnx"], default="torch")
+    parser.add_argument("--fixtures-dir", default=None, help="Keep fixtures here instead of a temp dir")
+    parser.add_argument("--keep-fixtures", action="store_true")
+    parser.add_argument("--out", default=None, help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
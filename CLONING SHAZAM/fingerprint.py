@@ -0,0 +1,222 @@
+"""Spectral-peak audio fingerprinting for the Shazam clone.
+
+Pipeline (NumPy only):
+    samples -> log-magnitude STFT -> constellation of local spectral peaks
+            -> combinatorial hashes of (anchor, target) peak pairs
+
+The reference index is an inverted index stored as parallel arrays sorted by
+hash: hash -> (track, anchor frame). A query looks up its hashes and votes on
+the offset between reference and query frames; a true match piles its votes
+onto a single (track, offset) pair.
+
+Track names should equal the subtitle `name` metadata so a match can be
+turned straight into subtitle chunks.
+
+Usage:
+    python fingerprint.py path/to/reference_audio [--out fingerprints.npz]
+"""
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from audio_decoding import SAMPLE_RATE, decode_audio_bytes
+
+N_FFT = 1024
+HOP = 512
+PEAK_NEIGHBORHOOD = (15, 11)  # (frequency bins, frames) a peak must dominate
+PEAKS_PER_SECOND = 30
+FAN_OUT = 10
+MAX_DT = 63  # target zone width in frames (6 bits)
+MAX_POSTINGS = 2000  # hashes more common than this carry no information
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a", ".mp4")
+
+
+def frame_seconds(frames):
+    return frames * HOP / SAMPLE_RATE
+
+
+def spectrogram(samples):
+    """Log-magnitude STFT, shape (frequency bins, frames)."""
+    samples = np.asarray(samples, dtype=np.float32)
+    if len(samples) < N_FFT:
+        samples = np.pad(samples, (0, N_FFT - len(samples)))
+    frames = sliding_window_view(samples, N_FFT)[::HOP]
+    magnitude = np.abs(np.fft.rfft(frames * np.hanning(N_FFT).astype(np.float32), axis=1))
+    return np.log1p(magnitude).T
+
+
+def _sliding_max(values, size, axis):
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (size // 2, size // 2)
+    padded = np.pad(values, pad, mode="constant", constant_values=-np.inf)
+    return sliding_window_view(padded, size, axis=axis).max(axis=-1)
+
+
+def find_peaks(spec):
+    """Constellation points (frame, bin) that are local maxima and among the loudest per second."""
+    local_max = _sliding_max(_sliding_max(spec, PEAK_NEIGHBORHOOD[0], 0), PEAK_NEIGHBORHOOD[1], 1)
+    # Ignore maxima in the noise floor; they are what changes between recordings
+    is_peak = (spec == local_max) & (spec > spec.mean() + spec.std())
+    bins, frames = np.nonzero(is_peak)
+    if len(frames) == 0:
+        return np.zeros((0, 2), dtype=np.int32)
+
+    # Keep a fixed density so loud and quiet recordings yield comparable hash counts
+    budget = max(int(frame_seconds(spec.shape[1]) * PEAKS_PER_SECOND), 1)
+    if len(frames) > budget:
+        strongest = np.argpartition(-spec[bins, frames], budget - 1)[:budget]
+        bins, frames = bins[strongest], frames[strongest]
+    order = np.lexsort((bins, frames))
+    return np.stack([frames[order], bins[order]], axis=1).astype(np.int32)
+
+
+def hash_peaks(peaks):
+    """Pair each anchor with its next FAN_OUT peaks; returns (hashes uint32, anchor frames int32)."""
+    hashes, anchors = [], []
+    for step in range(1, FAN_OUT + 1):
+        anchor, target = peaks[:-step], peaks[step:]
+        dt = target[:, 0] - anchor[:, 0]
+        valid = (dt > 0) & (dt <= MAX_DT)
+        anchor, target, dt = anchor[valid], target[valid], dt[valid]
+        hashes.append(
+            (anchor[:, 1].astype(np.uint32) << 16) | (target[:, 1].astype(np.uint32) << 6) | dt.astype(np.uint32)
+        )
+        anchors.append(anchor[:, 0])
+    if not hashes:
+        return np.zeros(0, np.uint32), np.zeros(0, np.int32)
+    return np.concatenate(hashes), np.concatenate(anchors).astype(np.int32)
+
+
+def fingerprint(samples):
+    """Hashes and anchor frames for 16 kHz mono samples."""
+    return hash_peaks(find_peaks(spectrogram(samples)))
+
+
+@dataclass
+class FingerprintMatch:
+    name: str
+    offset_seconds: float
+    votes: int
+    runner_up_votes: int
+    query_hashes: int
+
+    def is_confident(self, min_votes=20, min_ratio=3.0):
+        """A match is confident when enough hashes align and it clearly beats every other track."""
+        return self.votes >= min_votes and self.votes >= min_ratio * max(self.runner_up_votes, 1)
+
+
+class FingerprintIndex:
+    """Inverted index hash -> (track, offset) stored as arrays sorted by hash."""
+
+    def __init__(self, hashes, track_ids, offsets, names):
+        order = np.argsort(hashes, kind="stable")
+        self.hashes = hashes[order]
+        self.track_ids = track_ids[order]
+        self.offsets = offsets[order]
+        self.names = list(names)
+
+    @classmethod
+    def build(cls, tracks):
+        """Build from an iterable of (name, samples)."""
+        all_hashes, all_tracks, all_offsets, names = [], [], [], []
+        for track_id, (name, samples) in enumerate(tracks):
+            hashes, anchors = fingerprint(samples)
+            all_hashes.append(hashes)
+            all_offsets.append(anchors)
+            all_tracks.append(np.full(len(hashes), track_id, dtype=np.int32))
+            names.append(name)
+        if not names:
+            raise ValueError("No reference tracks to index.")
+        return cls(np.concatenate(all_hashes), np.concatenate(all_tracks), np.concatenate(all_offsets), names)
+
+    def save(self, path):
+        np.savez(path, hashes=self.hashes, track_ids=self.track_ids, offsets=self.offsets,
+                 names=np.array(json.dumps(self.names)))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = cls.__new__(cls)
+            index.hashes = data["hashes"]
+            index.track_ids = data["track_ids"]
+            index.offsets = data["offsets"]
+            index.names = json.loads(str(data["names"]))
+        return index
+
+    def match(self, samples):
+        """Best (track, offset) by vote count, or None when no hash matches."""
+        query_hashes, query_anchors = fingerprint(samples)
+        if len(query_hashes) == 0:
+            return None
+        lo = np.searchsorted(self.hashes, query_hashes, side="left")
+        hi = np.searchsorted(self.hashes, query_hashes, side="right")
+        counts = hi - lo
+        keep = (counts > 0) & (counts <= MAX_POSTINGS)
+        if not keep.any():
+            return None
+        lo, counts, query_anchors = lo[keep], counts[keep], query_anchors[keep]
+
+        # Expand every query hash into its postings without a Python loop
+        starts = np.repeat(lo, counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        postings = starts + within
+        tracks = self.track_ids[postings].astype(np.int64)
+        deltas = self.offsets[postings].astype(np.int64) - np.repeat(query_anchors, counts)
+
+        # Vote on (track, offset); the shift keeps negative deltas in their own buckets
+        keys = (tracks << 32) | (deltas + (1 << 31))
+        unique_keys, votes = np.unique(keys, return_counts=True)
+
+        # A query that does not start on a hop boundary splits its votes between adjacent offsets
+        neighbor = np.searchsorted(unique_keys, unique_keys + 1)
+        has_neighbor = neighbor < len(unique_keys)
+        has_neighbor[has_neighbor] &= unique_keys[neighbor[has_neighbor]] == unique_keys[has_neighbor] + 1
+        votes = votes + np.where(has_neighbor, votes[np.minimum(neighbor, len(votes) - 1)], 0)
+        best = np.argmax(votes)
+        best_track = int(unique_keys[best] >> 32)
+        best_delta = int((unique_keys[best] & 0xFFFFFFFF) - (1 << 31))
+
+        # Runner-up: strongest alignment belonging to any other track
+        other = (unique_keys >> 32) != best_track
+        runner_up = int(votes[other].max()) if other.any() else 0
+        return FingerprintMatch(
+            name=self.names[best_track],
+            offset_seconds=max(frame_seconds(best_delta), 0.0),
+            votes=int(votes[best]),
+            runner_up_votes=runner_up,
+            query_hashes=len(query_hashes),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the reference audio fingerprint index.")
+    parser.add_argument("audio_dir", help="Directory of reference audio/video; file stems become track names")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "fingerprints.npz"))
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(dirpath, f)
+        for dirpath, _, filenames in os.walk(args.audio_dir)
+        for f in filenames if f.lower().endswith(AUDIO_EXTENSIONS)
+    )
+
+    def tracks():
+        for path in paths:
+            with open(path, "rb") as f:
+                samples = decode_audio_bytes(f.read(), suffix=os.path.splitext(path)[1])
+            yield os.path.splitext(os.path.basename(path))[0], samples
+
+    started = time.perf_counter()
+    index = FingerprintIndex.build(tracks())
+    index.save(args.out)
+    print(f"Indexed {len(index.names)} tracks ({len(index.hashes)} hashes) in {time.perf_counter() - started:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
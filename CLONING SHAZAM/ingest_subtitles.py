@@ -0,0 +1,236 @@
+"""Build or refresh the `subtitle_embeddings` Chroma collection from .srt files.
+
+Each file is parsed into cues and cleaned with `preprocess_query`, the rules
+the app applies to transcribed queries. Cues are packed into overlapping
+word windows with `num`/`name`/`start`/`end` metadata. Parsing runs across
+a process pool. Only chunks whose content hash differs from the one stored
+in the collection are encoded (in large batches) and upserted, so a refresh
+costs time proportional to what changed.
+
+Usage:
+    python ingest_subtitles.py path/to/srt_dir [--persist-path .] [--workers 8] [--prune]
+"""
+import argparse
+import hashlib
+import os
+import re
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from lexical_index import build_lexical_index, collection_rows
+from subtitle_text import preprocess_query
+
+COLLECTION_NAME = "subtitle_embeddings"
+TIMESTAMP = re.compile(r'(\d{2}):(\d{2}):(\d{2}),(\d{3})\s*-->\s*(\d{2}):(\d{2}):(\d{2}),(\d{3})')
+
+
+def _seconds(h, m, s, ms):
+    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+
+
+def subtitle_num(name):
+    """Numeric id for a subtitle file: its leading digits if present, else a stable CRC32 of the name."""
+    match = re.match(r'\d+', name)
+    if match:
+        return int(match.group())
+    return zlib.crc32(name.encode("utf-8")) & 0x7FFFFFFF
+
+
+def read_srt(path):
+    """Read an .srt file, tolerating the legacy encodings common in subtitle dumps."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        return raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+
+def parse_cues(text):
+    """Return (start, end, cleaned text) for every non-empty cue in an .srt document."""
+    cues = []
+    for block in re.split(r'\r?\n\s*\r?\n', text):
+        match = TIMESTAMP.search(block)
+        if not match:
+            continue
+        body = block[match.end():]
+        cleaned = preprocess_query(body).strip()
+        if cleaned:
+            cues.append((_seconds(*match.groups()[:4]), _seconds(*match.groups()[4:]), cleaned))
+    return cues
+
+
+def source_id(path, root):
+    """The file's path relative to the corpus root, without extension: unique where basenames are not."""
+    return os.path.splitext(os.path.relpath(path, root))[0].replace(os.sep, "/")
+
+
+def chunk_file(path, root, window_words=100, overlap_words=20):
+    """Parse one .srt file into chunk records ready for upsert."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    source = source_id(path, root)
+    num = subtitle_num(name)
+    words, times = [], []
+    for start, end, cleaned in parse_cues(read_srt(path)):
+        for word in cleaned.split():
+            words.append(word)
+            times.append((start, end))
+
+    chunks = []
+    stride = max(window_words - overlap_words, 1)
+    for index, offset in enumerate(range(0, max(len(words) - overlap_words, 1), stride)):
+        window = words[offset:offset + window_words]
+        if not window:
+            break
+        document = " ".join(window)
+        start, end = times[offset][0], times[offset + len(window) - 1][1]
+        chunks.append({
+            "id": f"{source}::{index}",
+            "document": document,
+            "metadata": {
+                "num": num,
+                "name": name,
+                "source": source,
+                "chunk": index,
+                "start": start,
+                "end": end,
+                # Timestamps are part of the hash so re-timed subtitles are upserted too
+                "content_hash": hashlib.sha1(f"{source}\n{start}\n{end}\n{document}".encode("utf-8")).hexdigest(),
+            },
+        })
+    return source, chunks
+
+
+def _chunk_file_args(args):
+    return chunk_file(*args)
+
+
+def find_srt_files(root):
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        paths.extend(os.path.join(dirpath, f) for f in filenames if f.lower().endswith(".srt"))
+    return sorted(paths)
+
+
+def existing_hashes(collection, page_size=10000):
+    """Map id -> (source, content_hash) for everything already in the collection."""
+    stored = {}
+    total = collection.count()
+    for offset in range(0, total, page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+        for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+            # Chunks ingested before `source` existed were keyed by the bare file name
+            stored[chunk_id] = (metadata.get("source", metadata.get("name")), metadata.get("content_hash"))
+    return stored
+
+
+def ingest(srt_dir, persist_path, workers=None, window_words=100, overlap_words=20,
+           encode_batch_size=256, prune=False, lexical=True, log=print):
+    """Parse, diff, encode and upsert; returns a stats dict."""
+    import chromadb
+    from sentence_transformers import SentenceTransformer
+
+    started = time.perf_counter()
+    paths = find_srt_files(srt_dir)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parsed = list(pool.map(_chunk_file_args, [(p, srt_dir, window_words, overlap_words) for p in paths], chunksize=16))
+    chunks = [chunk for _, file_chunks in parsed for chunk in file_chunks]
+    parse_seconds = time.perf_counter() - started
+    log(f"Parsed {len(paths)} files into {len(chunks)} chunks in {parse_seconds:.1f}s")
+
+    client = chromadb.PersistentClient(path=persist_path)
+    # The app reports 1 - distance as the similarity, which is only the cosine in cosine space
+    collection = client.get_or_create_collection(COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    if space != "cosine":
+        log(f"Warning: existing collection uses {space} distance, so similarity scores are not cosine; "
+            f"delete {persist_path} and re-ingest to rebuild it")
+    stored = existing_hashes(collection)
+    changed = [c for c in chunks if stored.get(c["id"], (None, None))[1] != c["metadata"]["content_hash"]]
+
+    # Chunks that disappeared from re-ingested files (or from the corpus, with --prune) are removed
+    current_ids = {c["id"] for c in chunks}
+    ingested_sources = {source for source, _ in parsed}
+    # Also the bare names, so chunks stored under the old name-only ids are replaced by path-keyed ones
+    ingested_sources |= {source.rsplit("/", 1)[-1] for source in ingested_sources}
+    stale = [
+        chunk_id for chunk_id, (source, _) in stored.items()
+        if chunk_id not in current_ids and (prune or source in ingested_sources)
+    ]
+    log(f"{len(changed)} new or changed chunks, {len(chunks) - len(changed)} unchanged, {len(stale)} stale")
+
+    encode_started = time.perf_counter()
+    if changed:
+        model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+        max_batch = client.get_max_batch_size() if hasattr(client, "get_max_batch_size") else 5000
+        for offset in range(0, len(changed), max_batch):
+            batch = changed[offset:offset + max_batch]
+            embeddings = model.encode(
+                [c["document"] for c in batch],
+                batch_size=encode_batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+            )
+            collection.upsert(
+                ids=[c["id"] for c in batch],
+                embeddings=embeddings.tolist(),
+                documents=[c["document"] for c in batch],
+                metadatas=[c["metadata"] for c in batch],
+            )
+            elapsed = time.perf_counter() - encode_started
+            done = offset + len(batch)
+            log(f"  upserted {done}/{len(changed)} chunks ({done / max(elapsed, 1e-9):.1f} chunks/s)")
+    for offset in range(0, len(stale), 5000):
+        collection.delete(ids=stale[offset:offset + 5000])
+    encode_seconds = time.perf_counter() - encode_started
+
+    # The BM25 index is cheap to rebuild and must cover exactly what the collection holds
+    lexical_path = os.path.join(persist_path, "lexical_index")
+    if lexical and (changed or stale or not os.path.exists(os.path.join(lexical_path, "vocab.json"))):
+        lexical_started = time.perf_counter()
+        build_lexical_index(collection_rows(collection), lexical_path)
+        log(f"Rebuilt lexical index in {time.perf_counter() - lexical_started:.1f}s")
+
+    total_seconds = time.perf_counter() - started
+    stats = {
+        "files": len(paths),
+        "chunks": len(chunks),
+        "upserted": len(changed),
+        "deleted": len(stale),
+        "parse_seconds": round(parse_seconds, 3),
+        "encode_seconds": round(encode_seconds, 3),
+        "total_seconds": round(total_seconds, 3),
+        "parse_chunks_per_sec": round(len(chunks) / max(parse_seconds, 1e-9), 1),
+        "encode_chunks_per_sec": round(len(changed) / max(encode_seconds, 1e-9), 1),
+    }
+    log(f"Done in {total_seconds:.1f}s: {stats['encode_chunks_per_sec']} chunks/s encoded, "
+        f"{stats['parse_chunks_per_sec']} chunks/s parsed; collection now holds {collection.count()} chunks")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally build the subtitle_embeddings collection from .srt files.")
+    parser.add_argument("srt_dir", help="Directory searched recursively for .srt files")
+    parser.add_argument("--persist-path", default=os.path.dirname(os.path.abspath(__file__)), help="Chroma persist directory")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: CPU count)")
+    parser.add_argument("--window-words", type=int, default=100)
+    parser.add_argument("--overlap-words", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=256, help="SentenceTransformer encode batch size")
+    parser.add_argument("--prune", action="store_true", help="Also delete chunks of files no longer in srt_dir")
+    parser.add_argument("--skip-lexical", action="store_true", help="Do not rebuild the BM25 lexical index")
+    args = parser.parse_args()
+    ingest(
+        args.srt_dir,
+        args.persist_path,
+        workers=args.workers,
+        window_words=args.window_words,
+        overlap_words=args.overlap_words,
+        encode_batch_size=args.batch_size,
+        prune=args.prune,
+        lexical=not args.skip_lexical,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""BM25 inverted index over the subtitle chunks, plus reciprocal rank fusion.
+
+Exact lyric and dialogue quotes are matched far better (and faster) by
+keywords than by dense embeddings. The index lives next to the Chroma data
+in `lexical_index/` as flat arrays:
+
+    vocab.json                         sorted term list (term id = position)
+    indptr.npy                         int64 (V + 1) CSR row pointers per term
+    doc_ids.npy / tfs.npy              int32 / uint16 postings, grouped by term
+    doc_lens.npy                       int32 tokens per chunk
+    num.npy, ids / names / documents   chunk metadata (same layout as vector_index)
+
+Usage:
+    python lexical_index.py [--persist-path .]
+"""
+import argparse
+import json
+import math
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from vector_index import STRING_FIELDS, StringTable, write_strings
+
+TOKEN = re.compile(r"[a-z0-9']+")
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def build_lexical_index(rows, out_dir):
+    """Build from an iterable of (id, num, name, document) and write it to `out_dir`."""
+    os.makedirs(out_dir, exist_ok=True)
+    vocab = {}
+    term_ids, doc_ids, tfs, doc_lens = [], [], [], []
+    ids, nums, names, documents = [], [], [], []
+    for doc_index, (chunk_id, num, name, document) in enumerate(rows):
+        tokens = tokenize(document)
+        for term, tf in Counter(tokens).items():
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+            doc_ids.append(doc_index)
+            tfs.append(min(tf, 65535))
+        doc_lens.append(len(tokens))
+        ids.append(chunk_id)
+        nums.append(int(num))
+        names.append(name)
+        documents.append(document)
+
+    # Re-number terms alphabetically and group postings by term (CSR layout)
+    terms = sorted(vocab)
+    remap = np.empty(len(vocab), dtype=np.int64)
+    remap[[vocab[t] for t in terms]] = np.arange(len(terms))
+    term_ids = remap[np.asarray(term_ids, dtype=np.int64)]
+    order = np.argsort(term_ids, kind="stable")
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=indptr[1:])
+
+    np.save(os.path.join(out_dir, "indptr.npy"), indptr)
+    np.save(os.path.join(out_dir, "doc_ids.npy"), np.asarray(doc_ids, dtype=np.int32)[order])
+    np.save(os.path.join(out_dir, "tfs.npy"), np.asarray(tfs, dtype=np.uint16)[order])
+    np.save(os.path.join(out_dir, "doc_lens.npy"), np.asarray(doc_lens, dtype=np.int32))
+    np.save(os.path.join(out_dir, "num.npy"), np.asarray(nums, dtype=np.int64))
+    for field, values in zip(STRING_FIELDS, (ids, names, documents)):
+        write_strings(os.path.join(out_dir, field), values)
+    with open(os.path.join(out_dir, "vocab.json"), "w") as f:
+        json.dump(terms, f)
+    return len(ids)
+
+
+def collection_rows(collection, page_size=10000):
+    """Yield (id, num, name, document) for every chunk of a Chroma collection."""
+    for offset in range(0, collection.count(), page_size):
+        page = collection.get(limit=page_size, offset=offset, include=["documents", "metadatas"])
+        for chunk_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+            yield chunk_id, metadata.get("num", 0), str(metadata.get("name", "")), document or ""
+
+
+class BM25Index:
+    """Memory-mapped BM25 scorer."""
+
+    def __init__(self, index_dir, k1=1.2, b=0.75):
+        vocab_path = os.path.join(index_dir, "vocab.json")
+        if not os.path.exists(vocab_path):
+            raise FileNotFoundError(f"Lexical index not found at: {index_dir}. Run lexical_index.py to build it.")
+        with open(vocab_path) as f:
+            self.vocab = {term: i for i, term in enumerate(json.load(f))}
+        load = lambda name: np.load(os.path.join(index_dir, name), mmap_mode="r")
+        self.indptr, self.doc_ids, self.tfs = load("indptr.npy"), load("doc_ids.npy"), load("tfs.npy")
+        self.doc_lens = np.asarray(load("doc_lens.npy"), dtype=np.float32)
+        self.nums = load("num.npy")
+        self.ids, self.names, self.documents = (StringTable(os.path.join(index_dir, field)) for field in STRING_FIELDS)
+        self.avg_len = float(self.doc_lens.mean()) if len(self.doc_lens) else 0.0
+        self.k1, self.b = k1, b
+
+    def count(self):
+        return len(self.doc_lens)
+
+    def search(self, query, top_k=5):
+        """Return (rows, scores, coverage) best first.
+
+        `coverage` is, per returned row, the share of the query's IDF mass whose
+        terms appear in that chunk; exact quotes score close to 1.0.
+        """
+        n = self.count()
+        query_terms = set(tokenize(query))
+        terms = [self.vocab[t] for t in query_terms if t in self.vocab]
+        if not terms or n == 0:
+            return np.zeros(0, np.int64), np.zeros(0, np.float32), np.zeros(0, np.float32)
+        # Words missing from the corpus still count against coverage, as maximally rare terms
+        total_idf = sum(self._idf(n, t) for t in terms) + (len(query_terms) - len(terms)) * math.log(1 + (n + 0.5) / 0.5)
+
+        scores = np.zeros(n, dtype=np.float32)
+        matched_idf = np.zeros(n, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lens / max(self.avg_len, 1e-9))
+        for t in terms:
+            start, end = self.indptr[t], self.indptr[t + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            idf = self._idf(n, t)
+            # Each document appears at most once per term, so plain fancy-index += is safe
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm[docs])
+            matched_idf[docs] += idf
+
+        k = min(top_k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[scores[top] > 0]
+        return top, scores[top], matched_idf[top] / max(total_idf, 1e-9)
+
+    def _idf(self, n, term_id):
+        df = self.indptr[term_id + 1] - self.indptr[term_id]
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def row(self, i):
+        return {"id": self.ids[i], "num": int(self.nums[i]), "name": self.names[i], "document": self.documents[i]}
+
+
+def is_strong_lexical_hit(scores, coverage, min_coverage=0.9, min_lead=1.2):
+    """A lexical result is decisive when it contains (nearly) every query term and leads the runner-up."""
+    if len(scores) == 0 or coverage[0] < min_coverage:
+        return False
+    return len(scores) == 1 or scores[0] >= min_lead * scores[1]
+
+
+def reciprocal_rank_fusion(ranked_lists, k=60):
+    """Fuse ranked lists of ids; returns [(id, normalized score)] best first.
+
+    Scores are divided by the best attainable total (rank 1 in every list), so
+    they fall in (0, 1].
+    """
+    fused = {}
+    for ranked in ranked_lists:
+        for rank, item in enumerate(ranked, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    best_possible = len(ranked_lists) / (k + 1)
+    return sorted(((item, score / best_possible) for item, score in fused.items()), key=lambda x: -x[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the BM25 lexical index from the subtitle_embeddings collection.")
+    parser.add_argument("--persist-path", default=os.path.dirname(os.path.abspath(__file__)), help="Chroma persist directory")
+    parser.add_argument("--collection", default="subtitle_embeddings")
+    parser.add_argument("--out", default=None, help="Output directory (default: <persist-path>/lexical_index)")
+    args = parser.parse_args()
+
+    import chromadb
+
+    client = chromadb.PersistentClient(path=args.persist_path)
+    collection = client.get_collection(args.collection)
+    out_dir = args.out or os.path.join(args.persist_path, "lexical_index")
+    total = build_lexical_index(collection_rows(collection), out_dir)
+    print(f"Indexed {total} chunks into {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
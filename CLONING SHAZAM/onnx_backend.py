@@ -0,0 +1,323 @@
+"""Quantized ONNX Runtime inference backend for the CPU-only deployment.
+
+- MiniLM sentence encoder: the transformer is exported to ONNX, int8
+  dynamically quantized and run with ONNX Runtime; mean pooling and L2
+  normalization (the rest of the all-MiniLM-L6-v2 pipeline) run in NumPy.
+  `OnnxSentenceEncoder.encode` mirrors `SentenceTransformer.encode`.
+- Whisper: the audio encoder, which dominates CPU time, is exported and
+  quantized the same way and swapped into the loaded model. The token
+  decoder keeps Whisper's PyTorch loop (its kv-cache hooks do not survive
+  ONNX export) but its linear layers are int8 dynamically quantized with
+  torch. The parity check fails when none were quantized.
+
+Exports are written once to `onnx_models/` and reused. ONNX Runtime
+sessions use ONNX_INTRA_OP_THREADS (default: all cores) with one inter-op
+thread; torch's process-wide thread count is left alone.
+
+Usage:
+    python onnx_backend.py export [--whisper-model base]
+    python onnx_backend.py parity [--audio-dir fixtures/audio]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from genai_common.tracing import rss_bytes  # noqa: E402
+
+logger = logging.getLogger("shazam.onnx")
+
+MODELS_DIR = os.environ.get(
+    "SHAZAM_ONNX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "onnx_models")
+)
+ENCODER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+OPSET = 17
+
+# Fixture sentences for the encoder parity check: dialogue, lyrics and subtitle noise
+PARITY_SENTENCES = [
+    "i'll be back",
+    "may the force be with you",
+    "we're gonna need a bigger boat",
+    "hello darkness my old friend i've come to talk with you again",
+    "is this the real life is this just fantasy",
+    "you can't handle the truth",
+    "the quick brown fox jumps over the lazy dog",
+    "here's looking at you kid",
+    "i see dead people",
+    "winter is coming",
+]
+
+
+def session_options():
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = int(os.environ.get("ONNX_INTRA_OP_THREADS", os.cpu_count() or 1))
+    options.inter_op_num_threads = 1
+    return options
+
+
+def create_session(path):
+    import onnxruntime as ort
+
+    return ort.InferenceSession(path, sess_options=session_options(), providers=["CPUExecutionProvider"])
+
+
+def quantize(fp32_path, int8_path):
+    """int8 dynamic quantization of weights; activations are quantized on the fly."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    os.unlink(fp32_path)
+
+
+# --- Sentence encoder ---------------------------------------------------------
+
+def encoder_dir():
+    return os.path.join(MODELS_DIR, "all-MiniLM-L6-v2")
+
+
+def export_sentence_encoder(out_dir=None):
+    """Export and quantize the MiniLM transformer; returns the directory."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    out_dir = out_dir or encoder_dir()
+    os.makedirs(out_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(ENCODER_MODEL)
+    model = AutoModel.from_pretrained(ENCODER_MODEL).eval()
+    dummy = tokenizer(["export the encoder"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    fp32_path = os.path.join(out_dir, "model.fp32.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in names),
+            fp32_path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in names + ["last_hidden_state"]},
+            opset_version=OPSET,
+        )
+    quantize(fp32_path, os.path.join(out_dir, "model.int8.onnx"))
+    tokenizer.save_pretrained(out_dir)
+    return out_dir
+
+
+class OnnxSentenceEncoder:
+    """Drop-in replacement for SentenceTransformer('all-MiniLM-L6-v2').encode on CPU."""
+
+    def __init__(self, model_dir=None, max_length=256):
+        from transformers import AutoTokenizer
+
+        model_dir = model_dir or encoder_dir()
+        if not os.path.exists(os.path.join(model_dir, "model.int8.onnx")):
+            export_sentence_encoder(model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = create_session(os.path.join(model_dir, "model.int8.onnx"))
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.max_length = max_length
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, convert_to_numpy=True, **kwargs):
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        outputs = []
+        for start in range(0, len(sentences), batch_size):
+            batch = self.tokenizer(
+                sentences[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            feed = {name: batch[name].astype(np.int64) for name in self.input_names if name in batch}
+            hidden = self.session.run(None, feed)[0]
+            # Mean pooling over real tokens, then L2 normalization (the MiniLM sentence pipeline)
+            mask = batch["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            outputs.append(pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12))
+        embeddings = np.concatenate(outputs) if outputs else np.zeros((0, 384), np.float32)
+        return embeddings[0] if single else embeddings
+
+
+# --- Whisper ------------------------------------------------------------------
+
+def whisper_dir(model_name):
+    return os.path.join(MODELS_DIR, f"whisper-{model_name}")
+
+
+def export_whisper_encoder(model, out_dir):
+    """Export and quantize a loaded Whisper model's audio encoder."""
+    import torch
+
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, "encoder.fp32.onnx")
+    mel = torch.zeros(1, model.dims.n_mels, 2 * model.dims.n_audio_ctx)
+    with torch.no_grad():
+        torch.onnx.export(
+            model.encoder,
+            (mel,),
+            fp32_path,
+            input_names=["mel"],
+            output_names=["audio_features"],
+            dynamic_axes={"mel": {0: "batch"}, "audio_features": {0: "batch"}},
+            opset_version=OPSET,
+        )
+    quantize(fp32_path, os.path.join(out_dir, "encoder.int8.onnx"))
+
+
+def plain_linears(module):
+    """Swap Linear subclasses (Whisper's casts weights to the input dtype) for nn.Linear sharing their weights.
+
+    Dynamic quantization maps module types exactly, so subclasses would be left in fp32.
+    """
+    import torch
+
+    for name, child in module.named_children():
+        if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+            plain = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+            plain.weight = child.weight
+            plain.bias = child.bias
+            setattr(module, name, plain)
+        else:
+            plain_linears(child)
+    return module
+
+
+def quantized_linear_count(module):
+    import torch
+
+    return sum(isinstance(m, torch.ao.nn.quantized.dynamic.Linear) for m in module.modules())
+
+
+def load_whisper(model_name="base"):
+    """Whisper with an ONNX Runtime int8 audio encoder and a torch int8 decoder."""
+    import torch
+    import whisper
+
+    class OnnxAudioEncoder(torch.nn.Module):
+        def __init__(self, session):
+            super().__init__()
+            self.session = session
+
+        def forward(self, mel):
+            features = self.session.run(None, {"mel": mel.detach().cpu().float().numpy()})[0]
+            return torch.from_numpy(features)
+
+    model = whisper.load_model(model_name, device="cpu")
+    out_dir = whisper_dir(model_name)
+    encoder_path = os.path.join(out_dir, "encoder.int8.onnx")
+    if not os.path.exists(encoder_path):
+        export_whisper_encoder(model, out_dir)
+    model.encoder = OnnxAudioEncoder(create_session(encoder_path))
+    model.decoder = torch.ao.quantization.quantize_dynamic(
+        plain_linears(model.decoder), {torch.nn.Linear}, dtype=torch.qint8
+    )
+    if quantized_linear_count(model.decoder) == 0:
+        logger.warning("No Whisper decoder layers were quantized; the decoder runs in fp32")
+    return model
+
+
+# --- Parity check ---------------------------------------------------------------
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length."""
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h))
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+
+def check_parity(audio_dir=None, whisper_model="base", min_cosine=0.98, max_wer=0.15):
+    """Compare the ONNX backend against the torch path; returns a JSON-serializable report."""
+    from sentence_transformers import SentenceTransformer
+
+    report = {"passed": True}
+
+    torch_encoder = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
+    onnx_encoder = OnnxSentenceEncoder()
+    started = time.perf_counter()
+    reference = torch_encoder.encode(PARITY_SENTENCES, show_progress_bar=False)
+    torch_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    candidate = onnx_encoder.encode(PARITY_SENTENCES)
+    onnx_seconds = time.perf_counter() - started
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cosine = (reference * candidate).sum(axis=1)
+    report["encoder"] = {
+        "min_cosine": round(float(cosine.min()), 4),
+        "mean_cosine": round(float(cosine.mean()), 4),
+        "torch_seconds": round(torch_seconds, 4),
+        "onnx_seconds": round(onnx_seconds, 4),
+    }
+    report["passed"] &= bool(cosine.min() >= min_cosine)
+
+    if audio_dir:
+        import whisper
+
+        from audio_decoding import decode_audio_bytes
+
+        torch_model = whisper.load_model(whisper_model, device="cpu")
+        onnx_model = load_whisper(whisper_model)
+        files = []
+        for name in sorted(os.listdir(audio_dir)):
+            with open(os.path.join(audio_dir, name), "rb") as f:
+                samples = decode_audio_bytes(f.read(), suffix=os.path.splitext(name)[1])
+            timings = {}
+            texts = {}
+            for label, model in (("torch", torch_model), ("onnx", onnx_model)):
+                started = time.perf_counter()
+                texts[label] = model.transcribe(samples, fp16=False)["text"].strip()
+                timings[label] = time.perf_counter() - started
+            wer = word_error_rate(texts["torch"], texts["onnx"])
+            files.append({
+                "file": name,
+                "wer_vs_torch": round(wer, 4),
+                "torch_seconds": round(timings["torch"], 3),
+                "onnx_seconds": round(timings["onnx"], 3),
+            })
+            report["passed"] &= wer <= max_wer
+        report["whisper"] = files
+        quantized = quantized_linear_count(onnx_model.decoder)
+        report["whisper_quantized_linears"] = quantized
+        report["passed"] &= quantized > 0
+    # Current RSS with both backends still loaded; left out where it cannot be read
+    rss = rss_bytes()
+    if rss:
+        report["rss_mb"] = round(rss / 2 ** 20, 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and verify the quantized ONNX inference backend.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export and quantize the MiniLM encoder and the Whisper audio encoder")
+    export.add_argument("--whisper-model", default="base")
+    parity = sub.add_parser("parity", help="Compare ONNX outputs with the torch path on fixtures")
+    parity.add_argument("--audio-dir", default=None, help="Directory of fixture audio for the Whisper comparison")
+    parity.add_argument("--whisper-model", default="base")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"Sentence encoder exported to {export_sentence_encoder()}")
+        load_whisper(args.whisper_model)
+        print(f"Whisper audio encoder exported to {whisper_dir(args.whisper_model)}")
+    else:
+        report = check_parity(args.audio_dir, args.whisper_model)
+        print(json.dumps(report, indent=2))
+        raise SystemExit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Caches for the Shazam clone.
+
+- TranscriptCache: persistent SQLite store of Whisper transcripts, keyed by a
+  hash of the decoded audio plus the Whisper model name.
+- EmbeddingCache: bounded in-memory LRU of query embeddings, keyed by the
+  preprocessed query text.
+
+Both evict by size and keep hit/miss counters for display in the sidebar.
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from genai_common.sqlite_cache import BoundedCache  # noqa: E402
+
+
+def audio_cache_key(samples, model_name):
+    """Content address for a decoded audio buffer transcribed by `model_name`."""
+    digest = hashlib.sha256(model_name.encode("utf-8"))
+    digest.update(memoryview(samples).cast("B"))
+    return digest.hexdigest()
+
+
+class TranscriptCache(BoundedCache):
+    """SQLite-backed transcript cache with least-recently-used eviction by total text size (64 MiB by default)."""
+
+    table = "transcripts"
+    value_column = "text"
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        super().__init__(path, max_bytes)
+
+
+class EmbeddingCache:
+    """In-memory LRU of query embeddings bounded by total array size."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query):
+        """Return the cached embedding for a preprocessed query, or None."""
+        with self._lock:
+            embedding = self._entries.get(query)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(query)
+            self.hits += 1
+            return embedding
+
+    def put(self, query, embedding):
+        """Store an embedding and evict the least recently used ones beyond `max_bytes`."""
+        with self._lock:
+            previous = self._entries.pop(query, None)
+            if previous is not None:
+                self._size -= previous.nbytes
+            self._entries[query] = embedding
+            self._size += embedding.nbytes
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+
+    def stats(self):
+        """Entry count, stored bytes and hit/miss counters."""
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "hits": self.hits, "misses": self.misses}
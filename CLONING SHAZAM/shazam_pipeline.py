@@ -0,0 +1,222 @@
+"""Streamlit-free stages of the Shazam clone pipeline.
+
+    decode -> (VAD) -> transcribe -> preprocess -> encode -> vector search
+
+APP_SHAZAM.py wires these stages to its UI; benchmark.py drives them
+directly. Heavy modules (torch, whisper, sentence-transformers, chromadb)
+are imported inside the loaders. Each stage is timed with the shared
+`genai_common.tracing` spans.
+"""
+import os
+import sys
+import threading
+
+from audio_decoding import SAMPLE_RATE as WHISPER_SAMPLE_RATE
+from lexical_index import is_strong_lexical_hit, reciprocal_rank_fusion
+from subtitle_text import preprocess_query
+from vector_index import MmapVectorIndex
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(APP_DIR))
+from genai_common.tracing import span, traced  # noqa: E402
+
+WHISPER_MODEL_NAME = "base"  # Use the 'base' model for better performance on CPU
+
+
+# --- Loaders --------------------------------------------------------------------
+
+def load_encoder(backend="torch"):
+    """all-MiniLM-L6-v2 on CPU, through PyTorch or the quantized ONNX Runtime backend."""
+    if backend == "onnx":
+        from onnx_backend import OnnxSentenceEncoder
+        return OnnxSentenceEncoder()
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+
+
+def load_collection(backend="chroma", persist_path=APP_DIR, index_path=None):
+    """Return (collection, location) for the Chroma collection or the memory-mapped NumPy export."""
+    try:
+        # The NumPy index exposes the same count()/query() interface as a Chroma collection
+        if backend == "numpy":
+            index_path = index_path or os.path.join(persist_path, "subtitle_index")
+            return MmapVectorIndex(index_path), index_path
+
+        # Check if chroma.sqlite3 exists
+        db_path = os.path.join(persist_path, "chroma.sqlite3")
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"ChromaDB database file not found at: {db_path}")
+
+        import chromadb
+        client = chromadb.PersistentClient(path=persist_path)
+        # Verify the collection exists
+        collections = client.list_collections()
+        collection_names = [col.name for col in collections]
+        if "subtitle_embeddings" not in collection_names:
+            raise ValueError(f"Collection 'subtitle_embeddings' not found in ChromaDB. Available collections: {collection_names}")
+
+        collection = client.get_collection("subtitle_embeddings")
+        return collection, persist_path
+    except Exception as e:
+        raise Exception(f"Error loading collection: {str(e)}")
+
+
+def load_whisper_model(model_name=WHISPER_MODEL_NAME, backend="torch"):
+    try:
+        if backend == "onnx":
+            from onnx_backend import load_whisper as load_onnx_whisper
+            return load_onnx_whisper(model_name)
+        import whisper
+        if not hasattr(whisper, 'load_model'):
+            raise AttributeError("The 'whisper' module does not have a 'load_model' function. Ensure you have installed 'openai-whisper', not the 'whisper' package.")
+        return whisper.load_model(model_name)
+    except Exception as e:
+        raise Exception(f"Failed to load Whisper model: {str(e)}")
+
+
+# --- Transcription ----------------------------------------------------------------
+
+@traced("shazam.transcribe")
+def transcribe(whisper_model, samples):
+    """Whisper transcript of 16 kHz mono samples ("" when there is nothing to transcribe)."""
+    if len(samples) == 0:
+        # Whisper would only hallucinate on padding
+        return ""
+    result = whisper_model.transcribe(samples, fp16=False)  # Disable FP16 for CPU compatibility
+    return result["text"].strip()
+
+
+def stream_transcription(whisper_model, samples, window_seconds=5.0):
+    """Transcribe samples window by window, yielding (seconds processed, transcript so far)."""
+    window = int(window_seconds * WHISPER_SAMPLE_RATE)
+    text_so_far = ""
+    for start in range(0, len(samples), window):
+        segment = samples[start:start + window]
+        # Feed the tail of the transcript as a prompt so words split across windows stay coherent
+        with span("shazam.transcribe_window"):
+            result = whisper_model.transcribe(
+                segment,
+                fp16=False,
+                initial_prompt=text_so_far[-200:] or None,
+                condition_on_previous_text=False,
+            )
+        text = result["text"].strip()
+        if text:
+            text_so_far = f"{text_so_far} {text}".strip()
+        yield min(start + window, len(samples)) / WHISPER_SAMPLE_RATE, text_so_far
+
+
+# --- Search -------------------------------------------------------------------------
+
+class SubtitleSearcher:
+    """Dense, lexical and hybrid subtitle search returning result rows keyed by chunk id.
+
+    `get_encoder` and `get_collection` are callables so lazily loaded
+    resources are only resolved when a search needs them.
+    """
+
+    def __init__(self, get_encoder, get_collection, lexical_index=None, embedding_cache=None, pool=None):
+        self.get_encoder = get_encoder
+        self.get_collection = get_collection
+        self.lexical_index = lexical_index
+        self.embedding_cache = embedding_cache
+        self.pool = pool
+
+    def encode(self, cleaned_query):
+        """Query embedding, served from the LRU when the same cleaned query was seen before."""
+        query_embedding = self.embedding_cache.get(cleaned_query) if self.embedding_cache is not None else None
+        if query_embedding is None:
+            with span("shazam.encode"):
+                query_embedding = self.get_encoder().encode([cleaned_query], show_progress_bar=False)[0]
+            if self.embedding_cache is not None:
+                self.embedding_cache.put(cleaned_query, query_embedding)
+        return query_embedding
+
+    def dense_search(self, cleaned_query, top_k=5, cancelled=None):
+        """Semantic search over the collection; skips the query when `cancelled` is set after encoding."""
+        query_embedding = self.encode(cleaned_query).tolist()
+        if cancelled is not None and cancelled.is_set():
+            return []
+        with span("shazam.collection_query", top_k=top_k):
+            results = self.get_collection().query(
+                query_embeddings=[query_embedding],
+                n_results=top_k,
+                include=["documents", "metadatas", "distances"]
+            )
+        retrieved_results = []
+        for chunk_id, doc, metadata, distance in zip(results['ids'][0], results['documents'][0], results['metadatas'][0], results['distances'][0]):
+            retrieved_results.append({
+                'id': chunk_id,
+                'Num': metadata['num'],
+                'Name': metadata['name'],
+                'Subtitle Chunk': doc,
+                'Similarity Score': round(1 - distance, 3),
+                'Confidence': round(1 - distance, 3),
+            })
+        return retrieved_results
+
+    def lexical_search(self, cleaned_query, top_k=5):
+        """BM25 rows plus the raw (scores, coverage) used to judge a decisive keyword hit."""
+        with span("shazam.lexical_search", top_k=top_k):
+            rows, scores, coverage = self.lexical_index.search(cleaned_query, top_k)
+        lexical_results = []
+        for i, score, cover in zip(rows, scores, coverage):
+            row = self.lexical_index.row(i)
+            lexical_results.append({
+                'id': row['id'],
+                'Num': row['num'],
+                'Name': row['name'],
+                'Subtitle Chunk': row['document'],
+                # Relative BM25 weighted by query coverage, so partial matches never look decisive
+                'Similarity Score': round(float(score / scores[0] * cover), 3),
+                'Confidence': round(float(score / scores[0] * cover), 3),
+            })
+        return lexical_results, scores, coverage
+
+    def hybrid_search(self, cleaned_query, top_k=5, race_dense=True):
+        """BM25 + dense search merged with reciprocal rank fusion.
+
+        A strong lexical hit (nearly every query term in the top chunk, clearly
+        ahead of the runner-up) is returned as is. With `race_dense` (the
+        default) dense search runs in parallel with BM25, so inconclusive
+        keyword results cost max(lexical, dense) rather than their sum. The race
+        buys latency, not work: once encoding has started it runs to the end,
+        and a strong lexical hit only skips the collection query. Without
+        `race_dense`, strong lexical hits skip dense encoding entirely.
+
+        Fused rows keep the chunk's dense cosine as 'Confidence' (0 for
+        keyword-only chunks). Rank-fused scores are compressed near the top
+        (rank 1 vs rank 2 in both lists is 1.0 vs 0.984), so score-margin
+        early exits are judged on cosine instead.
+        """
+        candidates = max(top_k * 4, 20)
+        cancelled = threading.Event()
+        dense_future = (
+            self.pool.submit(self.dense_search, cleaned_query, candidates, cancelled)
+            if race_dense and self.pool else None
+        )
+
+        lexical_results, scores, coverage = self.lexical_search(cleaned_query, candidates)
+        if is_strong_lexical_hit(scores, coverage):
+            if dense_future is not None:
+                cancelled.set()
+                dense_future.cancel()
+            return lexical_results[:top_k]
+
+        dense_results = dense_future.result() if dense_future is not None else self.dense_search(cleaned_query, candidates)
+        dense_confidence = {r['id']: r['Confidence'] for r in dense_results}
+        by_id = {r['id']: r for r in dense_results}
+        by_id.update({r['id']: r for r in lexical_results if r['id'] not in by_id})
+        fused = reciprocal_rank_fusion([[r['id'] for r in lexical_results], [r['id'] for r in dense_results]])
+        return [
+            dict(by_id[chunk_id], **{'Similarity Score': round(score, 3), 'Confidence': dense_confidence.get(chunk_id, 0.0)})
+            for chunk_id, score in fused[:top_k]
+        ]
+
+    def search(self, query, top_k=5, mode="Hybrid", race_dense=True):
+        """Preprocess a raw transcript and run hybrid search when a lexical index is available."""
+        with span("shazam.search", mode=mode if self.lexical_index is not None else "Dense"):
+            cleaned_query = preprocess_query(query)
+            if self.lexical_index is not None and mode == "Hybrid":
+                return self.hybrid_search(cleaned_query, top_k, race_dense=race_dense)
+            return self.dense_search(cleaned_query, top_k)
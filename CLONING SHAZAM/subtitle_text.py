@@ -0,0 +1,12 @@
+"""Subtitle text cleaning shared by the app's query path and the ingestion tool."""
+import re
+
+
+def preprocess_query(query):
+    """Clean and preprocess the query to match subtitle cleaning."""
+    query = re.sub(r'\d{2}:\d{2}:\d{2},\d{3}\s*-->\s*\d{2}:\d{2}:\d{2},\d{3}', '', query)
+    query = re.sub(r'^\d+\r?\n', '', query, flags=re.MULTILINE)
+    query = re.sub(r'\s+', ' ', query.strip())
+    query = re.sub(r'\[.*?\]|\(.*?\)', '', query)
+    query = re.sub(r'<.*?>', '', query)
+    return query.lower()
@@ -0,0 +1,134 @@
+"""Lightweight energy/spectral voice-activity detection.
+
+Whisper transcribes every 30-second window whether or not anyone speaks,
+and hallucinates text on silence and instrumental passages. `trim_silence`
+finds voiced regions, pads them slightly and packs them into one shorter
+buffer for transcription. A frame counts as voiced when it passes three
+tests:
+- frame energy above the clip's own noise floor
+- spectral flatness below a limit (noise is flat, voices and instruments are peaky)
+- syllable-rate modulation: the speech-band (300-3400 Hz) energy envelope
+  swings at 2-8 Hz in speech, while sustained or steadily rhythmic music is
+  nearly flat there. This drops instrumental intros and interludes.
+
+Limitations: sung vocals are kept, which is what lyric search needs.
+Staccato or percussive music with strong 2-8 Hz accents can still pass.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from audio_decoding import SAMPLE_RATE
+
+FRAME_SECONDS = 0.03
+# Window over which the envelope's modulation is measured (about six syllables)
+MODULATION_WINDOW_SECONDS = 1.5
+SPEECH_BAND_HZ = (300.0, 3400.0)
+SYLLABLE_RATE_HZ = (2.0, 8.0)
+
+
+@dataclass
+class VadReport:
+    segments: list  # (start_seconds, end_seconds) of kept audio, in the original timeline
+    total_seconds: float
+    kept_seconds: float
+
+    @property
+    def skipped_fraction(self):
+        return 1.0 - self.kept_seconds / self.total_seconds if self.total_seconds else 0.0
+
+
+def syllable_modulation_db(power, freqs, envelope_range_db=40.0):
+    """Per-frame RMS (in dB) of the speech-band envelope's 2-8 Hz modulation, over a centered window."""
+    band = (freqs >= SPEECH_BAND_HZ[0]) & (freqs <= SPEECH_BAND_HZ[1])
+    envelope = 10 * np.log10(power[:, band].sum(axis=1))
+    # Digital silence would dominate the swing; limit the envelope's range below the loud frames
+    envelope = np.maximum(envelope, np.percentile(envelope, 95) - envelope_range_db)
+
+    window = int(round(MODULATION_WINDOW_SECONDS / FRAME_SECONDS))
+    half = window // 2
+    windows = sliding_window_view(np.pad(envelope, (half, window - 1 - half), mode="edge"), window)
+    windows = windows - windows.mean(axis=1, keepdims=True)
+    taper = np.hanning(window)
+    spectrum = np.abs(np.fft.rfft(windows * taper, axis=1)) ** 2
+    rates = np.fft.rfftfreq(window, FRAME_SECONDS)
+    syllabic = (rates >= SYLLABLE_RATE_HZ[0]) & (rates <= SYLLABLE_RATE_HZ[1])
+    # Parseval: mean square of the band-limited, tapered envelope
+    return np.sqrt(2 * spectrum[:, syllabic].sum(axis=1) / (window * (taper ** 2).sum()))
+
+
+def voiced_frames(samples, sample_rate=SAMPLE_RATE, margin_db=12.0, floor_dbfs=-50.0, max_noise_floor_dbfs=-45.0,
+                  max_flatness=0.5, min_modulation_db=4.0):
+    """Boolean mask of voiced FRAME_SECONDS frames; `min_modulation_db=None` keeps music as well."""
+    frame = int(FRAME_SECONDS * sample_rate)
+    n_frames = len(samples) // frame
+    if n_frames == 0:
+        return np.zeros(0, dtype=bool)
+    frames = np.asarray(samples[:n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    # The clip's own quiet frames define the noise floor; the cap keeps all-speech clips from raising it
+    noise_floor = min(np.percentile(energy_db, 10), max_noise_floor_dbfs)
+    loud = (energy_db > noise_floor + margin_db) & (energy_db > floor_dbfs)
+
+    power = np.abs(np.fft.rfft(frames * np.hanning(frame).astype(np.float32), axis=1)) ** 2 + 1e-12
+    flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+    voiced = loud & (flatness < max_flatness)
+    if min_modulation_db is not None:
+        # On benchmark.py's synthetic fixtures speech windows measure ~9-12 dB and chord, pad and 2 Hz-beat
+        # music ~0-2 dB; 4 dB keeps all of the synthetic speech and ~2% of the chords. Real speech is less
+        # deeply modulated than the synthetic bursts, so the threshold stays well below the speech range.
+        freqs = np.fft.rfftfreq(frame, 1 / sample_rate)
+        voiced &= syllable_modulation_db(power, freqs) >= min_modulation_db
+    return voiced
+
+
+def speech_segments(mask, min_speech=0.25, min_gap=0.4, padding=0.2):
+    """Turn a frame mask into padded (start, end) second ranges, bridging short gaps."""
+    if not mask.any():
+        return []
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    starts = (np.nonzero(edges == 1)[0] * FRAME_SECONDS).tolist()
+    ends = (np.nonzero(edges == -1)[0] * FRAME_SECONDS).tolist()
+    total = len(mask) * FRAME_SECONDS
+
+    merged = []
+    for start, end in zip(starts, ends):
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    segments = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start, end = max(start - padding, 0.0), min(end + padding, total)
+        if segments and start <= segments[-1][1]:
+            segments[-1] = (segments[-1][0], end)
+        else:
+            segments.append((start, end))
+    return segments
+
+
+def trim_silence(samples, sample_rate=SAMPLE_RATE, gap_seconds=0.1, **kwargs):
+    """Return (packed voiced samples, VadReport).
+
+    Segments are joined with `gap_seconds` of silence so words from separate
+    segments are not fused together.
+    """
+    segments = speech_segments(voiced_frames(samples, sample_rate, **kwargs))
+    gap = np.zeros(int(gap_seconds * sample_rate), dtype=np.float32)
+    pieces = []
+    for start, end in segments:
+        if pieces:
+            pieces.append(gap)
+        pieces.append(samples[int(start * sample_rate):int(end * sample_rate)])
+    packed = np.concatenate(pieces).astype(np.float32, copy=False) if pieces else np.zeros(0, dtype=np.float32)
+    report = VadReport(
+        segments=segments,
+        total_seconds=len(samples) / sample_rate,
+        kept_seconds=sum(end - start for start, end in segments),
+    )
+    return packed, report
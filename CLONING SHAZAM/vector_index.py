@@ -0,0 +1,197 @@
+"""Memory-mapped NumPy vector index for the subtitle embeddings.
+
+The export step copies the `subtitle_embeddings` Chroma collection into a
+directory of flat files:
+
+    embeddings.npy                float32 (n, dim), L2-normalized rows
+    num.npy                       int64 (n,) `num` metadata
+    ids / names / documents       UTF-8 blob (.bin) + int64 offsets (.offsets.npy)
+    index.json                    dimension, count and the collection's distance space
+
+MmapVectorIndex maps those files read-only, so worker processes share the
+pages through the OS page cache and open the index without loading it.
+Its `count()`, `query()` and `get()` mirror the Chroma collection API, which lets
+`search_subtitles` use either backend unchanged.
+
+Usage:
+    python vector_index.py --persist-path . --out subtitle_index
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+STRING_FIELDS = ("ids", "names", "documents")
+
+
+def write_strings(path_prefix, strings):
+    """Write strings as one UTF-8 blob plus an offsets array."""
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    with open(path_prefix + ".bin", "wb") as f:
+        for i, value in enumerate(strings):
+            encoded = value.encode("utf-8")
+            f.write(encoded)
+            offsets[i + 1] = offsets[i] + len(encoded)
+    np.save(path_prefix + ".offsets.npy", offsets)
+
+
+class StringTable:
+    """Read-only, memory-mapped view of strings written by `write_strings`."""
+
+    def __init__(self, path_prefix):
+        self.offsets = np.load(path_prefix + ".offsets.npy", mmap_mode="r")
+        size = int(self.offsets[-1])
+        # np.memmap cannot map an empty file
+        self.blob = np.memmap(path_prefix + ".bin", dtype=np.uint8, mode="r") if size else np.zeros(0, np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+
+def export_collection(collection, out_dir, batch_size=5000):
+    """Export a Chroma collection's embeddings, metadata and documents into `out_dir`."""
+    os.makedirs(out_dir, exist_ok=True)
+    total = collection.count()
+    ids, names, documents = [], [], []
+    nums = np.zeros(total, dtype=np.int64)
+    vectors = None
+
+    for offset in range(0, total, batch_size):
+        batch = collection.get(
+            limit=batch_size,
+            offset=offset,
+            include=["embeddings", "metadatas", "documents"],
+        )
+        embeddings = np.asarray(batch["embeddings"], dtype=np.float32)
+        if vectors is None:
+            # Written straight into the .npy file so the full matrix never sits in memory twice
+            vectors = np.lib.format.open_memmap(
+                os.path.join(out_dir, "embeddings.npy"), mode="w+", dtype=np.float32, shape=(total, embeddings.shape[1])
+            )
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        vectors[offset:offset + len(embeddings)] = embeddings / np.maximum(norms, 1e-12)
+        for i, (doc_id, metadata, doc) in enumerate(zip(batch["ids"], batch["metadatas"], batch["documents"])):
+            ids.append(doc_id)
+            names.append(str(metadata.get("name", "")))
+            documents.append(doc or "")
+            nums[offset + i] = int(metadata.get("num", 0))
+
+    if vectors is None:
+        raise ValueError("Collection is empty; nothing to export.")
+    vectors.flush()
+    del vectors
+    np.save(os.path.join(out_dir, "num.npy"), nums)
+    for field, values in zip(STRING_FIELDS, (ids, names, documents)):
+        write_strings(os.path.join(out_dir, field), values)
+
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    dim = int(np.load(os.path.join(out_dir, "embeddings.npy"), mmap_mode="r").shape[1])
+    with open(os.path.join(out_dir, "index.json"), "w") as f:
+        json.dump({"count": total, "dim": dim, "space": space}, f)
+    return total
+
+
+class MmapVectorIndex:
+    """Top-k cosine search over memory-mapped, normalized embeddings."""
+
+    def __init__(self, index_dir, block_rows=262144):
+        index_json = os.path.join(index_dir, "index.json")
+        if not os.path.exists(index_json):
+            raise FileNotFoundError(f"Vector index not found at: {index_dir}. Run vector_index.py to export it.")
+        with open(index_json) as f:
+            self.info = json.load(f)
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        self.nums = np.load(os.path.join(index_dir, "num.npy"), mmap_mode="r")
+        self.ids, self.names, self.documents = (StringTable(os.path.join(index_dir, field)) for field in STRING_FIELDS)
+        self.block_rows = block_rows
+
+    def count(self):
+        return len(self.embeddings)
+
+    def search(self, query_embeddings, top_k=5):
+        """Return (indices, similarities) arrays of shape (n_queries, k), best first."""
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        k = min(top_k, self.count())
+        if k == 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        # Scan in row blocks, keeping each block's top-k candidates, to bound temporary memory
+        cand_idx, cand_scores = [], []
+        for start in range(0, self.count(), self.block_rows):
+            scores = queries @ self.embeddings[start:start + self.block_rows].T  # (n_queries, rows)
+            block_k = min(k, scores.shape[1])
+            top = np.argpartition(-scores, block_k - 1, axis=1)[:, :block_k]
+            cand_idx.append(top + start)
+            cand_scores.append(np.take_along_axis(scores, top, axis=1))
+        cand_idx = np.concatenate(cand_idx, axis=1)
+        cand_scores = np.concatenate(cand_scores, axis=1)
+
+        top = np.argpartition(-cand_scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(cand_scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(np.take_along_axis(cand_idx, top, axis=1), order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+    def get(self, where=None, include=("documents", "metadatas")):
+        """Chroma-compatible get() supporting an equality filter on `name`."""
+        if where and set(where) != {"name"}:
+            raise ValueError("MmapVectorIndex.get() only supports filtering on 'name'.")
+        if where:
+            if not hasattr(self, "_rows_by_name"):
+                # Built on first use; only fingerprint matches look chunks up by title
+                self._rows_by_name = {}
+                for i in range(len(self.names)):
+                    self._rows_by_name.setdefault(self.names[i], []).append(i)
+            rows = self._rows_by_name.get(where["name"], [])
+        else:
+            rows = range(self.count())
+        results = {"ids": [self.ids[i] for i in rows]}
+        if "documents" in include:
+            results["documents"] = [self.documents[i] for i in rows]
+        if "metadatas" in include:
+            results["metadatas"] = [{"num": int(self.nums[i]), "name": self.names[i]} for i in rows]
+        return results
+
+    def _distance(self, similarity):
+        # Report distances in the exported collection's space so `1 - distance` scores match Chroma
+        if self.info.get("space") == "l2":
+            return float(2.0 - 2.0 * similarity)
+        return float(1.0 - similarity)
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances")):
+        """Chroma-compatible batched query returning lists of lists per query."""
+        indices, similarities = self.search(query_embeddings, n_results)
+        results = {"ids": [[self.ids[i] for i in row] for row in indices]}
+        if "documents" in include:
+            results["documents"] = [[self.documents[i] for i in row] for row in indices]
+        if "metadatas" in include:
+            results["metadatas"] = [[{"num": int(self.nums[i]), "name": self.names[i]} for i in row] for row in indices]
+        if "distances" in include:
+            results["distances"] = [[self._distance(s) for s in row] for row in similarities]
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the subtitle_embeddings Chroma collection to a memory-mapped NumPy index.")
+    parser.add_argument("--persist-path", default=os.path.dirname(os.path.abspath(__file__)), help="Directory containing chroma.sqlite3")
+    parser.add_argument("--collection", default="subtitle_embeddings")
+    parser.add_argument("--out", default=None, help="Output directory (default: <persist-path>/subtitle_index)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    import chromadb
+
+    client = chromadb.PersistentClient(path=args.persist_path)
+    collection = client.get_collection(args.collection)
+    out_dir = args.out or os.path.join(args.persist_path, "subtitle_index")
+    total = export_collection(collection, out_dir, batch_size=args.batch_size)
+    print(f"Exported {total} chunks to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
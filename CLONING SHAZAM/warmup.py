@@ -0,0 +1,93 @@
+"""Lazily loaded, process-wide model resources with a background warm-up.
+
+Heavy modules (torch via whisper/sentence-transformers, chromadb) are
+imported inside the loaders, so importing the app is cheap. `start_warmup`
+loads every resource on a daemon thread and runs one dummy inference each.
+Anything that needs a resource earlier simply blocks on `get()` until that
+resource is ready. Every phase is timed and logged.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger("shazam.startup")
+
+
+class LazyResource:
+    """A value built on first use, at most once per process, with its load time recorded.
+
+    A failed load is kept in `error` for status display, but the next `get()` tries again.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self.loaded = False
+        self.error = None
+        self.seconds = None
+
+    def get(self):
+        if self.loaded:
+            return self._value
+        with self._lock:
+            if not self.loaded:
+                started = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    self.error = e
+                    logger.error("Loading %s failed after %.2fs: %s", self.name, time.perf_counter() - started, e)
+                    raise
+                self.seconds = time.perf_counter() - started
+                self.error = None
+                self.loaded = True
+                logger.info("Loaded %s in %.2fs", self.name, self.seconds)
+        return self._value
+
+    @property
+    def status(self):
+        if self.loaded:
+            return "ready"
+        if self.error is not None:
+            return "failed"
+        return "loading"
+
+
+class Warmup:
+    """Loads resources and runs their dummy inferences on a background thread."""
+
+    def __init__(self, steps, timings=None):
+        # steps: list of (resource, warm function taking the loaded value, or None)
+        self.steps = steps
+        # Phases measured before the thread starts (e.g. app imports); the thread adds its own
+        self.timings = dict(timings or {})
+        self.done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="shazam-warmup", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        started = time.perf_counter()
+        for resource, warm in self.steps:
+            try:
+                value = resource.get()
+                self.timings[f"load {resource.name}"] = resource.seconds
+                if warm is not None:
+                    phase = time.perf_counter()
+                    warm(value)
+                    self.timings[f"warm {resource.name}"] = time.perf_counter() - phase
+                    logger.info("Warmed %s in %.2fs", resource.name, self.timings[f"warm {resource.name}"])
+            except Exception as e:
+                # The error stays on the resource for the status panel; a request needing it retries the load
+                logger.warning("Warm-up of %s skipped: %s", resource.name, e)
+        self.timings["warm-up total"] = time.perf_counter() - started
+        logger.info("Warm-up finished in %.2fs", self.timings["warm-up total"])
+        self.done.set()
+
+
+def start_warmup(steps, timings=None):
+    return Warmup(steps, timings).start()
@@ -1,32 +1,62 @@
 import os
+import sys
+import logging
 import streamlit as st
-from langchain.memory import ConversationBufferMemory
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import SystemMessage, HumanMessage, AIMessage
-from dotenv import load_dotenv
+from tutor_answer_cache import AnswerCache, is_context_free
+from tutor_memory import BudgetedSummaryMemory
+from tutor_streaming import FAKE_REPLIES, stream_reply
 
-# Get API key from Hugging Face Secrets
-load_dotenv(".code_reviewer_env")
-api_key = os.environ.get("GOOGLE_API_KEY")
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(APP_DIR))
+from genai_common import get_client, is_fake_backend, load_api_key, tracing  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+logger = logging.getLogger("tutor")
+# Span timings go to traces/tutor.jsonl (and /metrics when GENAI_METRICS_PORT is set)
+tracing.configure("tutor")
+
+# Streamlit UI Configuration (must be the first Streamlit call, before any cached loader runs)
+st.set_page_config(page_title='AI Data Science Tutor', page_icon="📊", layout='wide')
+
+# Get API key from Hugging Face Secrets (or the tutor's own env file when running locally)
+api_key = load_api_key(APP_DIR, ".DS_AI_tutore_env")
+# Recent turns kept verbatim in the prompt; older ones are folded into a running summary
+MEMORY_MAX_TURNS = int(os.environ.get("TUTOR_MEMORY_MAX_TURNS", "6"))
+MEMORY_MAX_TOKENS = int(os.environ.get("TUTOR_MEMORY_MAX_TOKENS", "2000"))
+# Semantic cache of answers to context-free questions (threshold defaults to the embedder's own)
+ANSWER_CACHE_TTL_HOURS = float(os.environ.get("TUTOR_ANSWER_CACHE_TTL_HOURS", "168"))
+ANSWER_CACHE_THRESHOLD = os.environ.get("TUTOR_ANSWER_CACHE_THRESHOLD")
 
 # Handle missing or invalid API key
-if not api_key:
+if not api_key and not is_fake_backend():
     st.error("❌ GOOGLE_API_KEY not found. Please set it in Hugging Face Secrets.")
     st.stop()
 
-# Initialize Chat Model with Error Handling
+# Shared, rate-limited chat client (created once per process, reused across reruns and sessions)
 try:
-    chat_model = ChatGoogleGenerativeAI(model='gemini-1.5-pro', temperature=0.7, google_api_key=api_key)
+    chat_model = get_client(api_key=api_key, model='gemini-1.5-pro', temperature=0.7, fake_replies=FAKE_REPLIES)
 except Exception as e:
     st.error(f"❌ Failed to initialize AI model: {e}")
     st.stop()
 
 # Initialize Memory for Conversation History
-if "memory" not in st.session_state:
-    st.session_state.memory = ConversationBufferMemory(return_messages=True)
+if not isinstance(st.session_state.get("memory"), BudgetedSummaryMemory):
+    st.session_state.memory = BudgetedSummaryMemory(chat_model, max_turns=MEMORY_MAX_TURNS, max_tokens=MEMORY_MAX_TOKENS)
+st.session_state.memory.summarizer = chat_model
 
-# Streamlit UI Configuration
-st.set_page_config(page_title='AI Data Science Tutor', page_icon="📊", layout='wide')
+
+# Answer cache shared across sessions; the fake backend gets its own file so canned replies never leak
+@st.cache_resource
+def load_answer_cache():
+    cache_path = os.path.join(APP_DIR, f"answer_cache{'_fake' if is_fake_backend() else ''}.sqlite3")
+    return AnswerCache(
+        cache_path,
+        threshold=float(ANSWER_CACHE_THRESHOLD) if ANSWER_CACHE_THRESHOLD else None,
+        ttl_seconds=ANSWER_CACHE_TTL_HOURS * 3600,
+    )
+
+answer_cache = load_answer_cache()
 
 # Custom CSS for Styling
 st.markdown(
@@ -115,7 +145,7 @@ chat_container = st.container()
 
 # Display Chat History
 with chat_container:
-    for msg in st.session_state.memory.chat_memory.messages:
+    for msg in st.session_state.memory.transcript:
         if isinstance(msg, HumanMessage):
             st.markdown(f'<div class="message-box user-message"><b>You:</b> {msg.content}</div>', unsafe_allow_html=True)
         elif isinstance(msg, AIMessage):
@@ -124,28 +154,94 @@ with chat_container:
 # User Input
 user_query = st.chat_input("Ask me anything about Data Science...")
 if user_query:
-    conversation_history = [system_message] + st.session_state.memory.chat_memory.messages + [HumanMessage(content=user_query)]
-
-    try:
-        ai_response = chat_model.invoke(conversation_history)
-    except Exception as e:
-        st.error(f"❌ AI response error: {e}")
-        st.stop()
-
-    # Store messages in memory
-    st.session_state.memory.chat_memory.add_user_message(user_query)
-    st.session_state.memory.chat_memory.add_ai_message(ai_response.content)
+    conversation_history = st.session_state.memory.prompt_messages(system_message, user_query)
+    prompt_tokens = st.session_state.memory.count_tokens(conversation_history)
 
-    # Display Messages
+    # Display the question, then stream the answer into its message box as tokens arrive
     with chat_container:
         st.markdown(f'<div class="message-box user-message"><b>You:</b> {user_query}</div>', unsafe_allow_html=True)
-        st.markdown(f'<div class="message-box ai-message"><b>AI:</b> {ai_response.content}</div>', unsafe_allow_html=True)
+        ai_placeholder = st.empty()
+
+    def render_partial(text):
+        ai_placeholder.markdown(f'<div class="message-box ai-message"><b>AI:</b> {text}▌</div>', unsafe_allow_html=True)
+
+    # First-turn and self-contained questions can be answered from the semantic cache
+    first_turn = not st.session_state.memory.transcript
+    cacheable = first_turn or is_context_free(user_query)
+    if cacheable:
+        with tracing.span("tutor.answer_cache_get"):
+            cached = answer_cache.get(user_query, user_level)
+    else:
+        cached = None
+
+    if cached is not None:
+        ai_text, similarity = cached
+        ai_placeholder.markdown(f'<div class="message-box ai-message"><b>AI:</b> {ai_text}</div>', unsafe_allow_html=True)
+        st.caption(f"⚡ Answered from cache (similarity {similarity:.2f})")
+        logger.info("Turn %d: answered from cache (similarity %.3f)", len(st.session_state.memory.transcript) // 2 + 1, similarity)
+    else:
+        try:
+            with tracing.span("tutor.stream_reply", prompt_tokens=prompt_tokens):
+                ai_text, stream_stats = stream_reply(chat_model, conversation_history, on_text=render_partial)
+        except Exception as e:
+            ai_placeholder.empty()
+            st.error(f"❌ AI response error: {e}")
+            st.stop()
+        ai_placeholder.markdown(f'<div class="message-box ai-message"><b>AI:</b> {ai_text}</div>', unsafe_allow_html=True)
+        if stream_stats.ttft is not None:
+            tracing.tracer.observe("tutor.time_to_first_token", stream_stats.ttft)
+        st.session_state.last_stream_stats = stream_stats
+        st.session_state.last_prompt_tokens = prompt_tokens
+        logger.info(
+            "Turn %d: prompt_tokens=%d (estimated) provider_input_tokens=%s ttft=%.3fs total=%.3fs chunks=%d",
+            len(st.session_state.memory.transcript) // 2 + 1, prompt_tokens, stream_stats.input_tokens,
+            stream_stats.ttft or 0.0, stream_stats.total, stream_stats.chunks,
+        )
+        # Later answers were generated with the conversation in the prompt and may lean on it, so only
+        # answers to a first turn are stored
+        if first_turn and ai_text:
+            answer_cache.put(user_query, user_level, ai_text, stream_stats.total)
+
+    # Store messages in memory only once the stream has completed (this may summarize older turns)
+    with tracing.span("tutor.memory_add_turn"):
+        st.session_state.memory.add_turn(user_query, ai_text)
+
+# Sidebar - Streaming debug panel
+with st.sidebar.expander("🐞 Debug: response timing"):
+    stats = st.session_state.get("last_stream_stats")
+    llm_stats = chat_model.metrics.summary()
+    st.caption(f"Backend: {'fake' if is_fake_backend() else 'gemini'} · {llm_stats['calls']} LLM calls, "
+               f"{llm_stats['retries']} retries, {llm_stats['errors']} errors")
+    if stats is None:
+        st.caption("No response streamed yet.")
+    else:
+        st.metric("Time to first token", f"{stats.ttft:.2f}s" if stats.ttft is not None else "—")
+        st.metric("Total response time", f"{stats.total:.2f}s")
+        st.caption(f"{stats.chunks} chunks, {stats.chars} characters, {stats.chars_per_second:.0f} chars/s after the first token")
+        st.caption(f"Prompt tokens: ~{st.session_state.get('last_prompt_tokens', 0)} estimated"
+                   + (f", {stats.input_tokens} reported" if stats.input_tokens else ""))
+    memory = st.session_state.memory
+    st.caption(f"Memory: {len(memory.recent) // 2} recent turns verbatim, {memory.folded_turns} summarized "
+               f"in ~{memory.summary_tokens} tokens (budget {memory.max_turns} turns / {memory.max_tokens} tokens, "
+               f"summary ≤ {memory.max_summary_tokens})")
+    if memory.summary:
+        st.text_area("Running summary", memory.summary, height=150, disabled=True)
+
+# Sidebar - Answer cache statistics
+with st.sidebar.expander("⚡ Answer cache"):
+    cache_stats = answer_cache.stats()
+    st.caption(f"{cache_stats['entries']} cached answers ({answer_cache.embedder.name}, threshold {answer_cache.threshold:.2f})")
+    st.caption(f"{cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)")
+    st.caption(f"≈{cache_stats['seconds_saved']:.1f}s of model time saved")
+
+# Sidebar - Per-stage latency (GENAI_TRACE_PANEL=1)
+tracing.render_streamlit_panel()
 
 # Sidebar - Chat History Download
-if st.session_state.memory.chat_memory.messages:
+if st.session_state.memory.transcript:
     chat_text = "\n".join([
         f"You: {msg.content}" if isinstance(msg, HumanMessage) else f"AI: {msg.content}"
-        for msg in st.session_state.memory.chat_memory.messages
+        for msg in st.session_state.memory.transcript
     ])
     st.sidebar.download_button("📥 Download Chat History", chat_text, file_name="chat_history.txt")
 
@@ -0,0 +1,266 @@
+"""Semantic answer cache for context-free tutor questions.
+
+Questions are embedded and compared by cosine similarity against earlier
+questions asked at the same learning level. A match returns the stored
+answer without calling the model when two conditions hold:
+- it is close enough
+- its topic words overlap the question's, differing only in phrasing
+  words ("give me an explanation of overfitting" reuses "what is
+  overfitting"), so "l1 and l2 regularization" never gets the
+  "l1 regularization" answer
+
+Entries live in SQLite and expire after a TTL; beyond `max_entries` the
+least recently used go first.
+
+Embeddings come from sentence-transformers (all-MiniLM-L6-v2, in
+requirements.txt). Hashed character n-grams, which need nothing beyond
+NumPy, are a stricter fallback.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from genai_common.sqlite_cache import connect  # noqa: E402
+
+logger = logging.getLogger("tutor.answer_cache")
+
+# Words that point back into the conversation: such questions depend on context and are never cached
+CONTEXT_WORDS = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "above", "previous", "earlier", "again",
+    "more", "same", "also", "another", "else", "instead",
+}
+# Question phrasing that carries no topic, dropped before embedding with hashed n-grams
+FILLER_WORDS = set(
+    "what whats s is are was were the a an of on for to and or do does did how can could would should i me you "
+    "please explain define describe tell about mean meaning means by with difference differences between vs "
+    "versus work works".split()
+)
+FILLER_PHRASES = re.compile(r"\b(in|for) (machine learning|ml|data science)\b")
+# Topic words that only ask for a style of answer; two questions may differ in these and still share an answer
+PHRASING_WORDS = set(
+    "give explanation overview definition intuition intuitive intuitively simple simply term word plain brief "
+    "briefly short quick quickly detail detailed concept idea basic know understand understanding want need help "
+    "like let us my your we our in as really exactly actually elaborate summarize summary clarify eli5 "
+    "beginner".split()
+)
+
+
+def normalize_question(question):
+    # "over-fitting" and "overfitting" are the same word
+    return " ".join(re.findall(r"[a-z0-9+#]+", re.sub(r"(?<=[a-z])-(?=[a-z])", "", question.lower())))
+
+
+def topic_words(question):
+    """The question's words minus phrasing, with plural "s" stripped: what a cached answer must match."""
+    words = FILLER_PHRASES.sub(" ", normalize_question(question)).split()
+    return frozenset(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+                     for w in words if w not in FILLER_WORDS)
+
+
+def core_topic(topic):
+    """Topic words without phrasing words; the topic itself if nothing else is left."""
+    return (topic - PHRASING_WORDS) or topic
+
+
+def topics_overlap(a, b):
+    """True when two topic word sets share their core words and differ only in phrasing words."""
+    return core_topic(a) == core_topic(b)
+
+
+def is_context_free(question):
+    """True when the question stands on its own, e.g. "what is overfitting"."""
+    words = normalize_question(question).split()
+    return 0 < len(words) <= 30 and not CONTEXT_WORDS.intersection(words)
+
+
+class HashingEmbedder:
+    """Topic words and their character 3-5 grams hashed into a fixed-size, L2-normalized vector.
+
+    Whole-word features are weighted up so that near-spellings with a different
+    meaning ("overfitting" / "underfitting") stay apart.
+    """
+
+    name = "hashed-ngrams-v3"  # v2: topic words with plurals folded; v3: phrasing words dropped
+    # Different questions sharing most n-grams ("tuple and set" / "list and tuple") reach ~0.85-0.92
+    threshold = 0.97
+
+    def __init__(self, dim=1024, word_weight=3.0):
+        self.dim = dim
+        self.word_weight = word_weight
+
+    def _bucket(self, feature):
+        return zlib.crc32(feature.encode("utf-8")) % self.dim
+
+    def encode(self, text):
+        words = sorted(core_topic(topic_words(text)))
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in words:
+            vector[self._bucket(f"w:{word}")] += self.word_weight
+            padded = f" {word} "
+            for n in (3, 4, 5):
+                for i in range(len(padded) - n + 1):
+                    vector[self._bucket(padded[i:i + n])] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SentenceEmbedder:
+    """all-MiniLM-L6-v2 on CPU, normalized so a dot product is the cosine similarity."""
+
+    name = "all-MiniLM-L6-v2"
+    threshold = 0.9
+
+    def __init__(self):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
+
+    def encode(self, text):
+        return self.model.encode([normalize_question(text)], normalize_embeddings=True, show_progress_bar=False)[0]
+
+
+def load_embedder():
+    try:
+        return SentenceEmbedder()
+    except Exception as e:
+        logger.info("sentence-transformers unavailable (%s); using hashed n-gram embeddings", e)
+        return HashingEmbedder()
+
+
+class AnswerCache:
+    """SQLite-backed semantic cache of tutor answers with TTL and LRU eviction."""
+
+    def __init__(self, path, embedder=None, threshold=None, ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.path = path
+        self.embedder = embedder or load_embedder()
+        self.threshold = threshold if threshold is not None else self.embedder.threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                level TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                embedder TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                answer_seconds REAL NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_access ON answers(last_access)")
+        self._conn.commit()
+        self._load_vectors()
+
+    def _load_vectors(self):
+        """Keep every live embedding in memory, one matrix per level, for a single matrix-vector lookup."""
+        rows = self._conn.execute(
+            "SELECT id, level, question, embedding FROM answers WHERE embedder = ? AND created > ?",
+            (self.embedder.name, time.time() - self.ttl_seconds),
+        ).fetchall()
+        grouped = {}
+        for row_id, level, question, blob in rows:
+            ids, topics, vectors = grouped.setdefault(level, ([], [], []))
+            ids.append(row_id)
+            topics.append(topic_words(question))
+            vectors.append(np.frombuffer(blob, dtype=np.float32))
+        # level -> (ids, topic word sets, embedding matrix)
+        self._vectors = {
+            level: (np.asarray(ids), topics, np.vstack(vectors)) for level, (ids, topics, vectors) in grouped.items()
+        }
+
+    def get(self, question, level):
+        """Return (answer, similarity) for the closest earlier question at this level on the same topic, or None."""
+        started = time.perf_counter()
+        query = self.embedder.encode(question).astype(np.float32)
+        topic = topic_words(question)
+        with self._lock:
+            ids, topics, vectors = self._vectors.get(level, (None, None, None))
+            if ids is not None:
+                similarities = vectors @ query
+                for best in np.argsort(-similarities):
+                    if similarities[best] < self.threshold:
+                        break
+                    if not topics_overlap(topics[best], topic):
+                        continue
+                    row = self._conn.execute(
+                        "SELECT answer, answer_seconds FROM answers WHERE id = ? AND created > ?",
+                        (int(ids[best]), time.time() - self.ttl_seconds),
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    self._conn.execute("UPDATE answers SET last_access = ? WHERE id = ?", (time.time(), int(ids[best])))
+                    self._conn.commit()
+                    self.hits += 1
+                    self.seconds_saved += max(row[1] - (time.perf_counter() - started), 0.0)
+                    return row[0], float(similarities[best])
+            self.misses += 1
+            return None
+
+    def put(self, question, level, answer, answer_seconds):
+        """Store an answer with the time it took to generate, then evict expired and excess entries."""
+        embedding = self.embedder.encode(question).astype(np.float32)
+        now = time.time()
+        with self._lock:
+            row_id = self._conn.execute(
+                "INSERT INTO answers (level, question, answer, embedder, embedding, answer_seconds, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (level, question, answer, self.embedder.name, embedding.tobytes(), answer_seconds, now, now),
+            ).lastrowid
+            evicted = self._evict(now)
+            self._conn.commit()
+            # Update the in-memory matrices in place instead of reloading every vector
+            ids, topics, vectors = self._vectors.get(level, (np.zeros(0, dtype=np.int64), [], None))
+            self._vectors[level] = (
+                np.append(ids, row_id),
+                topics + [topic_words(question)],
+                embedding[None, :] if vectors is None else np.vstack([vectors, embedding]),
+            )
+            if evicted:
+                self._drop_vectors(evicted)
+
+    def _evict(self, now):
+        """Delete expired entries and the least recently used beyond `max_entries`; returns the deleted ids."""
+        evicted = [row[0] for row in self._conn.execute(
+            """SELECT id FROM answers WHERE created <= ?
+               UNION SELECT id FROM (SELECT id FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?)""",
+            (now - self.ttl_seconds, self.max_entries),
+        )]
+        self._conn.executemany("DELETE FROM answers WHERE id = ?", [(row_id,) for row_id in evicted])
+        return evicted
+
+    def _drop_vectors(self, row_ids):
+        for level, (ids, topics, vectors) in list(self._vectors.items()):
+            keep = ~np.isin(ids, row_ids)
+            if keep.all():
+                continue
+            if not keep.any():
+                del self._vectors[level]
+                continue
+            self._vectors[level] = (ids[keep], [t for t, k in zip(topics, keep) if k], vectors[keep])
+
+    def stats(self):
+        """Entry count, hit/miss counters, hit rate and model time saved."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "seconds_saved": self.seconds_saved,
+        }
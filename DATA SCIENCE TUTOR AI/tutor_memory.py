@@ -0,0 +1,122 @@
+"""Token-budgeted conversation memory with an incrementally updated summary.
+
+The prompt holds the system message, a running summary of older turns,
+and the most recent turns verbatim. The summary and the verbatim turns
+together stay within `max_tokens`, and the verbatim turns within
+`max_turns`. When a turn falls out of the window, it is folded into the
+summary with one call: the existing summary plus only the new lines go
+in, and the updated summary comes out. Earlier turns are never
+re-summarized.
+
+The summary is capped at `max_summary_tokens` (a third of the budget by
+default). Once it grows past the cap it is re-compressed, and if it is
+still too long it is truncated, so prompts cannot grow without bound.
+
+The full transcript is kept separately for display and download.
+"""
+import logging
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
+
+logger = logging.getLogger("tutor.memory")
+
+SUMMARY_PROMPT = """Progressively summarize this tutoring conversation, adding onto the previous summary and returning a new summary.
+Keep the topics covered, what the student already understands or struggles with, and any code or definitions they may refer back to.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+New summary:"""
+
+COMPRESS_PROMPT = """Shorten this summary of a tutoring conversation to at most {words} words.
+Keep the topics covered, what the student understands or struggles with, and definitions they may refer back to.
+
+Summary:
+{summary}
+
+Shortened summary:"""
+
+
+def approx_tokens(messages):
+    """Local token estimate (~4 characters per token), so budgeting never costs an API call."""
+    return sum(len(m.content) // 4 + 4 for m in messages)
+
+
+class BudgetedSummaryMemory:
+    def __init__(self, summarizer, max_turns=6, max_tokens=2000, count_tokens=approx_tokens, max_summary_tokens=None):
+        self.summarizer = summarizer
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.max_summary_tokens = max_summary_tokens or max_tokens // 3
+        self.count_tokens = count_tokens
+        self.summary = ""
+        self.recent = []  # verbatim messages inside the budget, oldest first
+        self.transcript = []  # every message, for display and download
+        self.folded_turns = 0
+
+    def summary_message(self):
+        return SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}")
+
+    @property
+    def summary_tokens(self):
+        return self.count_tokens([self.summary_message()]) if self.summary else 0
+
+    def prompt_messages(self, system_message, user_query):
+        """Messages to send for the next turn."""
+        messages = [system_message]
+        if self.summary:
+            messages.append(self.summary_message())
+        return messages + self.recent + [HumanMessage(content=user_query)]
+
+    def add_turn(self, user_query, ai_text):
+        turn = [HumanMessage(content=user_query), AIMessage(content=ai_text)]
+        self.transcript.extend(turn)
+        self.recent.extend(turn)
+        self._fold()
+
+    def _fold(self):
+        """Move the oldest turns out of the verbatim window and into the summary."""
+        overflow = []
+        # Always keep the latest turn verbatim, even if it alone exceeds the budget.
+        # Once there is (or is about to be) a summary, its capped share is reserved from the budget.
+        while len(self.recent) > 2 and (
+            len(self.recent) > 2 * self.max_turns
+            or self.count_tokens(self.recent) > self.max_tokens - (self.max_summary_tokens if self.summary or overflow else 0)
+        ):
+            overflow.extend(self.recent[:2])
+            self.recent = self.recent[2:]
+        if not overflow:
+            return
+        prompt = SUMMARY_PROMPT.format(
+            summary=self.summary or "(none yet)",
+            new_lines=get_buffer_string(overflow, human_prefix="Student", ai_prefix="Tutor"),
+        )
+        try:
+            self.summary = self.summarizer.invoke(prompt).content.strip()
+        except Exception as e:
+            # Keep the old summary rather than failing the turn; the folded lines are still in the transcript
+            logger.warning("Summary update failed, %d messages dropped from context: %s", len(overflow), e)
+        self.folded_turns += len(overflow) // 2
+        self._cap_summary()
+
+    def _cap_summary(self):
+        """Re-compress a summary that outgrew its share of the budget; truncate if that is not enough."""
+        if self.summary_tokens <= self.max_summary_tokens:
+            return
+        # ~0.75 words per token
+        prompt = COMPRESS_PROMPT.format(words=int(self.max_summary_tokens * 0.75), summary=self.summary)
+        try:
+            self.summary = self.summarizer.invoke(prompt).content.strip() or self.summary
+        except Exception as e:
+            logger.warning("Summary compression failed, truncating instead: %s", e)
+        while self.summary and self.summary_tokens > self.max_summary_tokens:
+            self.summary = self.summary[:int(len(self.summary) * 0.9)].rsplit(" ", 1)[0]
+
+    def clear(self):
+        self.summary = ""
+        self.recent = []
+        self.transcript = []
+        self.folded_turns = 0
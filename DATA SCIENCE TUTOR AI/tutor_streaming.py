@@ -0,0 +1,63 @@
+"""Token streaming for the tutor's chat model, with time-to-first-token measurement.
+
+`stream_reply` consumes `chat_model.stream(messages)` and hands the growing
+text to a render callback, so the UI can paint each chunk as it arrives.
+The full reply is returned only once the stream ends; the caller commits it
+to memory then.
+
+With LLM_BACKEND=fake the app streams FAKE_REPLIES from a local model
+that needs no API key.
+"""
+import time
+from dataclasses import dataclass
+
+FAKE_REPLIES = [
+    "Overfitting happens when a model learns the noise in its training data instead of the underlying pattern. "
+    "It scores well on the training set but poorly on new data. Common fixes are more data, regularization "
+    "(L1/L2, dropout), simpler models and early stopping, checked with cross-validation.",
+    "A pandas DataFrame is a two-dimensional, labeled table. Each column is a Series with its own dtype. "
+    "You can select columns with df['col'], filter rows with boolean masks, and aggregate with df.groupby().",
+    "Gradient descent minimizes a loss by repeatedly stepping the parameters against the gradient. "
+    "The learning rate sets the step size: too large and it diverges, too small and it crawls.",
+]
+
+
+@dataclass
+class StreamStats:
+    ttft: float = None  # seconds until the first non-empty chunk
+    total: float = 0.0
+    chunks: int = 0
+    chars: int = 0
+    input_tokens: int = None  # prompt tokens reported by the provider, when it reports usage
+
+    @property
+    def chars_per_second(self):
+        streaming = self.total - (self.ttft or 0.0)
+        return self.chars / streaming if streaming > 0 else 0.0
+
+
+def stream_reply(chat_model, messages, on_text=None):
+    """Stream a reply, calling on_text(text_so_far) per chunk; returns (full text, StreamStats)."""
+    stats = StreamStats()
+    parts = []
+    started = time.perf_counter()
+    for chunk in chat_model.stream(messages):
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage:
+            # Providers report usage either once or cumulatively per chunk; the max covers both
+            stats.input_tokens = max(stats.input_tokens or 0, usage.get("input_tokens", 0))
+        text = chunk.content if isinstance(chunk.content, str) else "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part) for part in chunk.content
+        )
+        if not text:
+            continue
+        if stats.ttft is None:
+            stats.ttft = time.perf_counter() - started
+        stats.chunks += 1
+        parts.append(text)
+        if on_text is not None:
+            on_text("".join(parts))
+    stats.total = time.perf_counter() - started
+    reply = "".join(parts)
+    stats.chars = len(reply)
+    return reply, stats
@@ -0,0 +1,242 @@
+"""Headless batch review of every .py file in a directory or zip archive.
+
+Files are queued on a worker pool and each one is reviewed unit by unit
+(see review_chunks). Results are yielded as they finish. The shared LLM
+client's semaphore caps in-flight model calls across all workers.
+
+Every finished file is appended to a progress JSONL. A rerun with the
+same progress file skips files whose content has not changed, so an
+interrupted batch resumes where it stopped. The combined report is
+written as markdown and JSON, with files/min throughput.
+
+Usage:
+    python batch_review.py path/to/repo --out review_report
+    python batch_review.py repo.zip --out review_report --workers 8 --max-concurrency 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+
+from review_chunks import merge_reviews, review_units, split_source
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", ".venv", "venv", "env", "site-packages", "node_modules",
+             ".tox", ".nox", ".mypy_cache", ".pytest_cache", "build", "dist"}
+MAX_FILE_BYTES = 1024 * 1024
+
+
+@dataclass
+class FileResult:
+    path: str
+    sha256: str
+    units: int = 0
+    cached_units: int = 0
+    failed_units: int = 0
+    seconds: float = 0.0
+    report: str = ""
+    error: str = None
+    resumed: bool = False
+
+
+def iter_directory(root):
+    """Yield (relative path, bytes) for every .py file under `root`, skipping VCS and virtualenv dirs.
+
+    Files over MAX_FILE_BYTES are yielded with None instead of being read.
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS and not d.endswith(".egg-info"))
+        for name in sorted(filenames):
+            if name.endswith(".py"):
+                path = os.path.join(dirpath, name)
+                if os.path.getsize(path) > MAX_FILE_BYTES:
+                    yield os.path.relpath(path, root), None
+                    continue
+                with open(path, "rb") as f:
+                    yield os.path.relpath(path, root), f.read()
+
+
+def iter_zip(source):
+    """Yield (member path, bytes) for every .py file in a zip archive (path or file-like).
+
+    Members over MAX_FILE_BYTES are yielded with None and never decompressed.
+    """
+    with zipfile.ZipFile(source) as archive:
+        for info in sorted(archive.infolist(), key=lambda i: i.filename):
+            parts = info.filename.split("/")
+            if info.is_dir() or not info.filename.endswith(".py") or SKIP_DIRS.intersection(parts[:-1]):
+                continue
+            if info.file_size > MAX_FILE_BYTES:
+                yield info.filename, None
+                continue
+            with archive.open(info) as member:
+                # The declared size can be forged; never inflate more than the limit plus one byte
+                data = member.read(MAX_FILE_BYTES + 1)
+            yield info.filename, data if len(data) <= MAX_FILE_BYTES else None
+
+
+class BatchReview:
+    """Reviews many files concurrently, recording each finished file for resumption."""
+
+    def __init__(self, chain, progress_path, cache=None, model_name="", workers=4, unit_concurrency=4):
+        self.chain = chain
+        self.progress_path = progress_path
+        self.cache = cache
+        self.model_name = model_name
+        self.workers = workers
+        self.unit_concurrency = unit_concurrency
+        self._lock = threading.Lock()
+
+    def load_progress(self):
+        """Results already recorded in the progress file, by path."""
+        done = {}
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a line cut short by the interruption
+                    done[record["path"]] = FileResult(**record)
+        return done
+
+    def _record(self, result):
+        with self._lock, open(self.progress_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(result)) + "\n")
+
+    def review_file(self, path, data):
+        result = FileResult(path, hashlib.sha256(data).hexdigest() if data is not None else "")
+        started = time.perf_counter()
+        try:
+            if data is None:
+                raise ValueError(f"file is larger than {MAX_FILE_BYTES // 1024} KB")
+            units = split_source(data.decode("utf-8"))
+            failed = review_units(self.chain, units, self.unit_concurrency, cache=self.cache, model_name=self.model_name)
+            result.units = len(units)
+            result.cached_units = sum(unit.cached for unit in units)
+            result.failed_units = len(failed)
+            result.report = merge_reviews(units)
+        except Exception as e:
+            result.error = str(e)
+        result.seconds = time.perf_counter() - started
+        return result
+
+    def run(self, files):
+        """Yield a FileResult per file as it finishes; unchanged files from the progress file come first."""
+        done = self.load_progress()
+        pending = []
+        for path, data in files:
+            previous = done.get(path)
+            # Files that errored or had units fail are retried; fully reviewed, unchanged files are not
+            if (previous is not None and data is not None and previous.error is None and previous.failed_units == 0
+                    and previous.sha256 == hashlib.sha256(data).hexdigest()):
+                previous.resumed = True
+                yield previous
+            else:
+                pending.append((path, data))
+
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch-review")
+        try:
+            futures = [pool.submit(self.review_file, path, data) for path, data in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                self._record(result)
+                yield result
+        finally:
+            # On interruption, queued files are dropped; finished ones are already in the progress file
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def summarize(results, seconds):
+    reviewed = [r for r in results if not r.resumed]
+    return {
+        "files": len(results),
+        "reviewed": len(reviewed),
+        "resumed": len(results) - len(reviewed),
+        "errors": sum(r.error is not None for r in results),
+        "units": sum(r.units for r in results),
+        "cached_units": sum(r.cached_units for r in results),
+        "seconds": round(seconds, 2),
+        "files_per_minute": round(len(reviewed) / seconds * 60, 2) if seconds > 0 else 0.0,
+    }
+
+
+def render_markdown(results, summary):
+    lines = [
+        "# Code Review Report",
+        "",
+        f"{summary['files']} files ({summary['resumed']} resumed, {summary['errors']} errors), "
+        f"{summary['units']} units ({summary['cached_units']} from cache), "
+        f"{summary['files_per_minute']} files/min.",
+    ]
+    for result in sorted(results, key=lambda r: r.path):
+        lines += ["", f"## `{result.path}`", ""]
+        lines.append(f"⚠️ Review failed: {result.error}" if result.error else result.report)
+    return "\n".join(lines) + "\n"
+
+
+def write_reports(results, summary, out_prefix):
+    """Write `<out_prefix>.md` and `<out_prefix>.json`; returns both paths."""
+    md_path, json_path = f"{out_prefix}.md", f"{out_prefix}.json"
+    with open(md_path, "w", encoding="utf-8") as f:
+        f.write(render_markdown(results, summary))
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "files": [asdict(r) for r in sorted(results, key=lambda r: r.path)]}, f, indent=2)
+    return md_path, json_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Review every Python file in a directory or zip archive.")
+    parser.add_argument("source", help="Directory or .zip archive")
+    parser.add_argument("--out", default="review_report", help="Report path prefix (.md, .json, .progress.jsonl)")
+    parser.add_argument("--workers", type=int, default=4, help="Files reviewed at the same time")
+    parser.add_argument("--max-concurrency", type=int, default=None, help="Cap on in-flight model calls (LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--fresh", action="store_true", help="Ignore earlier progress and review everything again")
+    args = parser.parse_args()
+
+    if args.max_concurrency:
+        os.environ["LLM_MAX_CONCURRENCY"] = str(args.max_concurrency)
+    sys.path.insert(0, os.path.dirname(APP_DIR))
+    from genai_common import get_client, is_fake_backend, load_api_key, tracing
+    from review_cache import ReviewCache
+    from review_chunks import build_unit_chain
+
+    api_key = load_api_key(APP_DIR, ".code_reviewer_env")
+    tracing.configure("code_review_batch")
+    if not api_key and not is_fake_backend():
+        raise SystemExit("GOOGLE_API_KEY is not set (see .code_reviewer_env).")
+    model_name = f"{'fake' if is_fake_backend() else 'gemini'}:gemini-1.5-pro"
+    chain = build_unit_chain(get_client(api_key=api_key, model="gemini-1.5-pro").as_runnable())
+    cache = ReviewCache(os.path.join(APP_DIR, "review_cache.sqlite3"))
+
+    progress_path = f"{args.out}.progress.jsonl"
+    if args.fresh and os.path.exists(progress_path):
+        os.unlink(progress_path)
+    files = iter_zip(args.source) if zipfile.is_zipfile(args.source) else iter_directory(args.source)
+    batch = BatchReview(chain, progress_path, cache, model_name, workers=args.workers)
+
+    results = []
+    started = time.perf_counter()
+    try:
+        for result in batch.run(files):
+            results.append(result)
+            if not result.resumed:
+                tracing.tracer.observe("review.batch_file", result.seconds, result.error is None)
+            status = "resumed" if result.resumed else f"error: {result.error}" if result.error else \
+                f"{result.units} units ({result.cached_units} cached) in {result.seconds:.1f}s"
+            print(f"[{len(results)}] {result.path}: {status}", flush=True)
+    except KeyboardInterrupt:
+        print(f"Interrupted; rerun with the same --out to resume from {progress_path}", file=sys.stderr)
+    summary = summarize(results, time.perf_counter() - started)
+    md_path, json_path = write_reports(results, summary, args.out)
+    print(f"{summary['files']} files, {summary['files_per_minute']} files/min. Reports: {md_path}, {json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,44 @@
 import streamlit as st
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from dotenv import load_dotenv
+import hashlib
+import io
 import os
+import sys
+import time
+import zipfile
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(APP_DIR))
+from genai_common import get_client, is_fake_backend, load_api_key, tracing  # noqa: E402
+from batch_review import BatchReview, iter_zip, summarize, write_reports  # noqa: E402
+from review_cache import ReviewCache  # noqa: E402
+from review_chunks import build_unit_chain, merge_reviews, review_units, split_source  # noqa: E402
+
+# Files longer than this default to the chunked review mode
+CHUNKED_REVIEW_MIN_LINES = 300
+REVIEW_MODEL = "gemini-1.5-pro"
+# The fake backend gets its own cache keys so canned reviews never leak into real ones
+CACHE_MODEL_NAME = f"{'fake' if is_fake_backend() else 'gemini'}:{REVIEW_MODEL}"
+BATCH_RUNS_DIR = os.path.join(APP_DIR, "batch_runs")
 
 # Load environment variables
-load_dotenv(".code_reviewer_env")
-api_key = os.getenv("GOOGLE_API_KEY")
+api_key = load_api_key(APP_DIR, ".code_reviewer_env")
+
+# Span timings go to traces/code_review.jsonl (and /metrics when GENAI_METRICS_PORT is set)
+tracing.configure("code_review")
 
 # App Config
 st.set_page_config(page_title="AI Python Code Reviewer", layout="centered")
 
+
+# Findings per code unit, keyed on its normalized AST and shared across sessions
+@st.cache_resource
+def load_review_cache():
+    return ReviewCache(os.path.join(APP_DIR, "review_cache.sqlite3"), max_bytes=32 * 1024 * 1024)
+
+review_cache = load_review_cache()
+
 # Title
 st.markdown(
     "<h1 style='text-align: center; color: #00BFFF;'>🤖 AI-Powered Python Code Reviewer</h1>",
@@ -32,19 +59,27 @@ if uploaded_file is not None:
     except Exception as e:
         st.error(f"❌ Error reading file: {e}")
 
+# Review mode: large files are split along functions/classes and reviewed concurrently
+review_mode = st.radio(
+    "🧩 Review mode",
+    ["Whole file", "Split by functions and classes"],
+    index=1 if user_code.count("\n") >= CHUNKED_REVIEW_MIN_LINES else 0,
+    horizontal=True,
+    help="Splitting reviews each function, class or method separately and in parallel, "
+         "with the module's imports and globals as context. Units unchanged since an earlier review "
+         "(ignoring comments and formatting) are served from cache.",
+)
+
 # Submit button
 if st.button("🚀 Review My Code"):
-    if not api_key:
+    if not api_key and not is_fake_backend():
         st.error("🔑 Please set the GOOGLE_API_KEY in your .code_reviewer_env file.")
     elif not user_code.strip():
         st.warning("⚠️ Please provide some code to review.")
     else:
         try:
-            # Initialize Gemini Model
-            model = ChatGoogleGenerativeAI(
-                google_api_key=api_key,
-                model="gemini-1.5-pro"
-            )
+            # Shared, rate-limited Gemini client (one per process, reused across clicks and sessions)
+            model = get_client(api_key=api_key, model=REVIEW_MODEL).as_runnable()
 
             # Review Prompt
             prompt = ChatPromptTemplate.from_messages([
@@ -63,10 +98,34 @@ Output the review in markdown bullet points with clear structure. Do not include
 
             # Output pipeline
             parser = StrOutputParser()
-            chain = prompt | model | parser
 
-            # Invoke model
-            result = chain.invoke({"code": user_code})
+            if review_mode == "Whole file":
+                chain = prompt | model | parser
+
+                # Invoke model
+                with tracing.span("review.whole_file", lines=user_code.count("\n") + 1):
+                    result = chain.invoke({"code": user_code})
+            else:
+                chain = build_unit_chain(model)
+
+                # Review every function/class/method concurrently and merge the findings by line number
+                with tracing.span("review.split_source"):
+                    units = split_source(user_code)
+                started = time.perf_counter()
+                with st.spinner(f"Reviewing {len(units)} code units in parallel..."):
+                    with tracing.span("review.units", units=len(units)):
+                        failed = review_units(chain, units, cache=review_cache, model_name=CACHE_MODEL_NAME)
+                with tracing.span("review.merge"):
+                    result = merge_reviews(units)
+                cached_units = sum(unit.cached for unit in units)
+                st.caption(
+                    f"⏱️ {len(units)} units reviewed in {time.perf_counter() - started:.1f}s "
+                    f"(largest unit: {max(unit.lines for unit in units)} lines)"
+                )
+                st.caption(f"♻️ {cached_units} of {len(units)} units served from cache, "
+                           f"{len(units) - cached_units} sent to the model")
+                if failed:
+                    st.warning(f"⚠️ {len(failed)} unit(s) could not be reviewed: {', '.join(unit.name for unit in failed)}")
 
             # Show output
             st.markdown("### 🧠 Code Review Feedback:")
@@ -74,3 +133,52 @@ Output the review in markdown bullet points with clear structure. Do not include
 
         except Exception as e:
             st.error(f"❌ An error occurred while reviewing: {e}")
+
+# Batch review: every .py file in a zip archive, with each file's review shown as it finishes
+st.markdown("---")
+st.markdown("##### 📦 Or review a whole repository")
+uploaded_zip = st.file_uploader("Upload a .zip of your project", type=["zip"])
+if uploaded_zip is not None and st.button("🚀 Review Repository"):
+    if not api_key and not is_fake_backend():
+        st.error("🔑 Please set the GOOGLE_API_KEY in your .code_reviewer_env file.")
+    else:
+        zip_bytes = uploaded_zip.getvalue()
+        try:
+            files = list(iter_zip(io.BytesIO(zip_bytes)))
+        except zipfile.BadZipFile as e:
+            files = None
+            st.error(f"❌ Error reading zip archive: {e}")
+        if files == []:
+            st.warning("⚠️ No Python files found in the archive.")
+        elif files:
+            # Progress is keyed on the archive's content: uploading the same zip again resumes an interrupted run
+            os.makedirs(BATCH_RUNS_DIR, exist_ok=True)
+            run_prefix = os.path.join(BATCH_RUNS_DIR, hashlib.sha256(zip_bytes).hexdigest()[:16])
+            chain = build_unit_chain(get_client(api_key=api_key, model=REVIEW_MODEL).as_runnable())
+            batch = BatchReview(chain, f"{run_prefix}.progress.jsonl", review_cache, CACHE_MODEL_NAME)
+
+            progress = st.progress(0.0, text=f"Reviewing {len(files)} files...")
+            results = []
+            started = time.perf_counter()
+            for result in batch.run(files):
+                results.append(result)
+                if not result.resumed:
+                    tracing.tracer.observe("review.batch_file", result.seconds, result.error is None)
+                progress.progress(len(results) / len(files), text=f"{len(results)} / {len(files)} files reviewed")
+                icon = "⚠️" if result.error else "♻️" if result.resumed else "✅"
+                with st.expander(f"{icon} {result.path}"):
+                    st.markdown(f"Review failed: {result.error}" if result.error else result.report)
+
+            summary = summarize(results, time.perf_counter() - started)
+            md_path, json_path = write_reports(results, summary, run_prefix)
+            st.caption(
+                f"⏱️ {summary['files']} files ({summary['resumed']} resumed) in {summary['seconds']:.1f}s, "
+                f"{summary['files_per_minute']} files/min; {summary['cached_units']} of {summary['units']} units from cache"
+            )
+            with open(md_path, "rb") as f:
+                st.download_button("📥 Download report (Markdown)", f.read(), file_name="code_review_report.md")
+            with open(json_path, "rb") as f:
+                st.download_button("📥 Download report (JSON)", f.read(), file_name="code_review_report.json")
+
+# Sidebar - Per-stage latency (GENAI_TRACE_PANEL=1)
+tracing.render_streamlit_panel()
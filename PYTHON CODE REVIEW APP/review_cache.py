@@ -0,0 +1,29 @@
+"""Persistent cache of review findings per code unit.
+
+Keys come from `review_chunks.unit_cache_key`: a hash of the prompt, the
+model and the unit's normalized AST. Re-uploading a module after a small
+edit therefore only sends the changed functions and classes to the model.
+Values are JSON. Entries are evicted least recently used first once the
+stored size exceeds `max_bytes`.
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from genai_common.sqlite_cache import BoundedCache  # noqa: E402
+
+
+class ReviewCache(BoundedCache):
+    """SQLite-backed findings cache with least-recently-used eviction by total size; values are JSON."""
+
+    table = "reviews"
+
+    def get(self, key):
+        """Return the cached value for `key`, or None."""
+        text = super().get(key)
+        return None if text is None else json.loads(text)
+
+    def put(self, key, value):
+        """Store a JSON-serializable value and evict the least recently used entries beyond `max_bytes`."""
+        super().put(key, json.dumps(value))
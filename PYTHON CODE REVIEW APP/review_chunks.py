@@ -0,0 +1,319 @@
+"""AST-aware chunked review for large Python files.
+
+`split_source` cuts a module along `ast` boundaries into review units:
+- top-level functions
+- classes (split into their methods when a class is too long)
+- the remaining module-level statements
+
+Each unit carries the module's imports and globals as shared context.
+`review_units` fans the units out concurrently through a chain's
+`abatch`, so wall-clock time follows the largest unit rather than the
+file. With a ReviewCache, units whose normalized AST (and the module-level
+definitions they use) was reviewed before are served from it, with the
+cached line numbers remapped through the AST. Only changed or new units
+reach the model.
+`merge_reviews` turns the per-unit findings into one markdown report
+ordered by line number.
+"""
+import ast
+import asyncio
+import bisect
+import copy
+import hashlib
+import re
+from dataclasses import dataclass, field
+
+MAX_UNIT_LINES = 200
+MAX_CONTEXT_LINES = 60
+
+UNIT_PROMPT_SYSTEM = """You are an expert Python code reviewer. You are reviewing one part of a larger module.
+
+Provide:
+- Bugs or potential issues.
+- Suggestions for improvements and best practices.
+- Performance optimizations.
+- Security concerns, if any.
+
+Each code line is prefixed with its line number in the original file. Start every finding with that number,
+exactly as "- **L<number>**: <finding>". Only report findings for the code under review; the module context is
+there to resolve names. Reply with "- No issues found." if there is nothing to report. Do not repeat the code."""
+
+UNIT_PROMPT_HUMAN = """Module context (imports and globals):
+{context}
+
+Code under review: {kind} `{name}` (lines {start}-{end})
+{code}"""
+
+FINDING_LINE = re.compile(r"\*\*L(\d+)\*\*")
+
+
+@dataclass
+class CodeUnit:
+    name: str
+    kind: str  # "function", "class", "method" or "module"
+    start: int  # 1-based, inclusive, including decorators
+    end: int
+    code: str  # source lines prefixed with their line numbers
+    context: str = ""
+    fingerprint: str = ""  # normalized AST dump: blind to comments, formatting and position
+    context_fingerprint: str = ""  # normalized dump of the imports/globals (and class body) the unit refers to
+    anchors: list = field(default_factory=list)  # start line of every AST node, in a structure-determined order
+    findings: list = field(default_factory=list)  # (line, markdown) after review
+    cached: bool = False
+
+    @property
+    def lines(self):
+        return self.end - self.start + 1
+
+
+def numbered(lines, start):
+    return "\n".join(f"{start + i:>5} | {line}" for i, line in enumerate(lines))
+
+
+def node_span(node):
+    start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+    return start, node.end_lineno
+
+
+def normalized_dump(nodes):
+    """ast.dump without positions, so comments, whitespace and moving code around do not change it."""
+    return "\n".join(ast.dump(node, include_attributes=False) for node in nodes)
+
+
+def line_anchors(nodes):
+    """Start line of every AST node under `nodes`; equal normalized dumps give index-aligned lists."""
+    return [child.lineno for node in nodes for child in ast.walk(node) if hasattr(child, "lineno")]
+
+
+def bound_names(node):
+    """Names an import or module-level assignment binds."""
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return {alias.asname or alias.name.split(".")[0] for alias in node.names}
+    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+    return {n.id for target in targets for n in ast.walk(target) if isinstance(n, ast.Name)}
+
+
+def context_fingerprint(context_nodes, nodes, extra=""):
+    """Normalized dump of the module-level imports and assignments whose names `nodes` use."""
+    used = {n.id for node in nodes for n in ast.walk(node) if isinstance(n, ast.Name)}
+    relevant = [node for node, names in context_nodes if names & used]
+    return normalized_dump(relevant) + (f"\n{extra}" if extra else "")
+
+
+def module_context(tree, lines):
+    """Imports and module-level assignments, trimmed to MAX_CONTEXT_LINES."""
+    context = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign)):
+            start, end = node_span(node)
+            context.extend(lines[start - 1:end])
+    if len(context) > MAX_CONTEXT_LINES:
+        context = context[:MAX_CONTEXT_LINES] + [f"# ... {len(context) - MAX_CONTEXT_LINES} more lines"]
+    return "\n".join(context) or "(none)"
+
+
+def split_source(source, max_unit_lines=MAX_UNIT_LINES):
+    """Split a module into CodeUnits ordered by position; unparsable code becomes one unit."""
+    lines = source.splitlines()
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        # No AST to anchor findings to, so only an identical text (line for line) is a cache hit
+        return [CodeUnit("module", "module", 1, len(lines), numbered(lines, 1), "(unparsable module)",
+                         fingerprint="text:" + source)]
+
+    context = module_context(tree, lines)
+    context_nodes = [
+        (node, bound_names(node)) for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.Assign, ast.AnnAssign))
+    ]
+    units = []
+    loose = []  # consecutive module-level statements that are neither defs nor classes
+
+    def unit(name, kind, start, end, nodes):
+        return CodeUnit(name, kind, start, end, numbered(lines[start - 1:end], start), context,
+                        fingerprint=normalized_dump(nodes), context_fingerprint=context_fingerprint(context_nodes, nodes),
+                        anchors=line_anchors(nodes))
+
+    def flush_loose():
+        if loose:
+            start, end = loose[0][0].lineno, loose[-1][1]
+            units.append(unit("module-level code", "module", start, end, [node for node, _ in loose]))
+            loose.clear()
+
+    for node in tree.body:
+        start, end = node_span(node)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            flush_loose()
+            units.append(unit(node.name, "function", start, end, [node]))
+        elif isinstance(node, ast.ClassDef):
+            flush_loose()
+            units.extend(split_class(node, lines, context, max_unit_lines, context_nodes))
+        elif not isinstance(node, (ast.Import, ast.ImportFrom)):
+            loose.append((node, end))
+    flush_loose()
+    # A module of only imports still gets reviewed
+    return units or [unit("module", "module", 1, len(lines), tree.body)]
+
+
+def split_class(node, lines, context, max_unit_lines, context_nodes=()):
+    """One unit for a short class; otherwise its body outside methods plus one unit per method."""
+    start, end = node_span(node)
+    if end - start + 1 <= max_unit_lines:
+        return [CodeUnit(node.name, "class", start, end, numbered(lines[start - 1:end], start), context,
+                         fingerprint=normalized_dump([node]), context_fingerprint=context_fingerprint(context_nodes, [node]),
+                         anchors=line_anchors([node]))]
+
+    methods = [child for child in node.body if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    # The class header and class-level statements give each method its surrounding context
+    method_lines = set()
+    for method in methods:
+        method_lines.update(range(node_span(method)[0], method.end_lineno + 1))
+    class_lines = [(n, lines[n - 1]) for n in range(start, end + 1) if n not in method_lines]
+    class_context = f"{context}\n\n" + "\n".join(text for _, text in class_lines)
+
+    shell = copy.copy(node)
+    shell.body = [child for child in node.body if child not in methods]
+    shell_dump = normalized_dump([shell])
+    units = [CodeUnit(
+        node.name, "class", start, end,
+        "\n".join(f"{n:>5} | {text}" for n, text in class_lines), context,
+        fingerprint=shell_dump, context_fingerprint=context_fingerprint(context_nodes, [shell]),
+        anchors=line_anchors([shell]),
+    )]
+    for method in methods:
+        m_start, m_end = node_span(method)
+        units.append(CodeUnit(
+            f"{node.name}.{method.name}", "method", m_start, m_end,
+            numbered(lines[m_start - 1:m_end], m_start), class_context,
+            # Methods are keyed with their class name: the same body can mean different things elsewhere
+            fingerprint=f"{node.name}\n" + normalized_dump([method]),
+            # ...and with the class body they are reviewed against
+            context_fingerprint=context_fingerprint(context_nodes, [method], extra=shell_dump),
+            anchors=line_anchors([method]),
+        ))
+    return units
+
+
+def build_unit_chain(model):
+    """prompt | model | parser for reviewing one unit."""
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    prompt = ChatPromptTemplate.from_messages([("system", UNIT_PROMPT_SYSTEM), ("human", UNIT_PROMPT_HUMAN)])
+    return prompt | model | StrOutputParser()
+
+
+def unit_inputs(unit):
+    return {
+        "context": unit.context, "kind": unit.kind, "name": unit.name,
+        "start": unit.start, "end": unit.end, "code": unit.code,
+    }
+
+
+def parse_findings(unit, review):
+    """Split a unit's markdown review into (line, finding) pairs; unnumbered findings anchor at the unit start."""
+    findings = []
+    for block in re.split(r"\n(?=\s*[-*] )", review.strip()):
+        block = block.strip()
+        if not block or "no issues found" in block.lower():
+            continue
+        match = FINDING_LINE.search(block)
+        line = int(match.group(1)) if match else unit.start
+        findings.append((line if unit.start <= line <= unit.end else unit.start, block))
+    return sorted(findings, key=lambda item: item[0])
+
+
+def unit_cache_key(unit, model_name):
+    """Cache key for a unit's findings: the prompt, the model, the unit's kind, its normalized AST and the
+    normalized module-level definitions it refers to."""
+    digest = hashlib.sha256()
+    for part in (UNIT_PROMPT_SYSTEM, UNIT_PROMPT_HUMAN, model_name, unit.kind, unit.fingerprint, unit.context_fingerprint):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def shift_findings(findings, old_start, new_start):
+    """Move cached findings, and the line numbers quoted in them, to where the unit now starts."""
+    offset = new_start - old_start
+    return [
+        (line + offset, FINDING_LINE.sub(lambda m: f"**L{int(m.group(1)) + offset}**", text))
+        for line, text in findings
+    ]
+
+
+def remap_findings(findings, old_anchors, new_anchors, old_start, new_start):
+    """Move cached findings, and the line numbers quoted in them, onto the unit's current lines.
+
+    Equal normalized ASTs give index-aligned anchor lists, so a line that starts
+    a node maps to where that node starts now, whatever comments or blank lines
+    were added or removed. Lines starting no node (comments, continuation lines)
+    map to the nearest node above. Without anchors, everything is shifted by the
+    change in start line.
+    """
+    if not old_anchors or len(old_anchors) != len(new_anchors):
+        return shift_findings(findings, old_start, new_start)
+    mapping = {}
+    for old, new in zip(old_anchors, new_anchors):
+        mapping.setdefault(old, new)
+    known = sorted(mapping)
+
+    def remap(line):
+        if line in mapping:
+            return mapping[line]
+        i = bisect.bisect_right(known, line) - 1
+        return mapping[known[i]] if i >= 0 else line + new_start - old_start
+
+    return [
+        (remap(line), FINDING_LINE.sub(lambda m: f"**L{remap(int(m.group(1)))}**", text))
+        for line, text in findings
+    ]
+
+
+async def _review_units(chain, units, max_concurrency):
+    return await chain.abatch(
+        [unit_inputs(unit) for unit in units],
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+    )
+
+
+def review_units(chain, units, max_concurrency=8, cache=None, model_name=""):
+    """Review every unit concurrently; fills `unit.findings` and returns the units that failed.
+
+    With a cache, unchanged units are served from it (`unit.cached`) and
+    successful reviews of the rest are stored.
+    """
+    pending = []
+    for unit in units:
+        entry = cache.get(unit_cache_key(unit, model_name)) if cache is not None else None
+        if entry is not None:
+            unit.findings = remap_findings(entry["findings"], entry.get("anchors"), unit.anchors, entry["start"], unit.start)
+            unit.cached = True
+        else:
+            pending.append(unit)
+
+    reviews = asyncio.run(_review_units(chain, pending, max_concurrency)) if pending else []
+    failed = []
+    for unit, review in zip(pending, reviews):
+        if isinstance(review, Exception):
+            unit.findings = [(unit.start, f"- ⚠️ Review failed for this unit: {review}")]
+            failed.append(unit)
+        else:
+            unit.findings = parse_findings(unit, review)
+            if cache is not None:
+                cache.put(unit_cache_key(unit, model_name),
+                          {"start": unit.start, "anchors": unit.anchors, "findings": unit.findings})
+    return failed
+
+
+def merge_reviews(units):
+    """One markdown report: a section per unit with findings, in line order."""
+    sections = []
+    for unit in sorted(units, key=lambda u: u.start):
+        if not unit.findings:
+            continue
+        body = "\n".join(finding for _, finding in unit.findings)
+        sections.append(f"#### `{unit.name}` ({unit.kind}, lines {unit.start}-{unit.end})\n{body}")
+    return "\n\n".join(sections) or "No issues found."
@@ -0,0 +1,17 @@
+"""Code shared by the apps in this repository.
+
+Apps add the repository root to sys.path and import from here. The LLM
+client exports load on first use, so apps without the langchain
+dependencies (the Shazam clone) can still use `genai_common.tracing`.
+"""
+_LLM_CLIENT_EXPORTS = ("LLMClient", "get_client", "is_fake_backend", "load_api_key")
+
+__all__ = list(_LLM_CLIENT_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _LLM_CLIENT_EXPORTS:
+        from genai_common import llm_client
+
+        return getattr(llm_client, name)
+    raise AttributeError(f"module 'genai_common' has no attribute {name!r}")
@@ -0,0 +1,302 @@
+"""Process-wide Gemini client shared by the Travel Planner, the Code Reviewer and the Data Science Tutor.
+
+`get_client` returns one `LLMClient` per (backend, model, temperature, API
+key) for the whole process, so Streamlit reruns and sessions reuse the same
+underlying chat model and its HTTP connections. Every call goes through:
+
+    token bucket (per API key) -> concurrency semaphore (per API key)
+        -> chat model -> retry with jittered exponential backoff on 429/5xx
+
+and is recorded in `client.metrics` (per-call latency, queueing time,
+attempts, time to first token for streams).
+
+Settings come from the environment:
+    LLM_BACKEND             gemini (default) or fake (local GenericFakeChatModel, no API key)
+    LLM_MAX_CONCURRENCY     in-flight calls per API key (default 4)
+    LLM_REQUESTS_PER_MINUTE token-bucket rate per API key (default 60)
+    LLM_MAX_RETRIES         retries after the first attempt (default 4)
+"""
+import asyncio
+import hashlib
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from genai_common.tracing import span, tracer
+
+logger = logging.getLogger("genai.llm_client")
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+                   "DeadlineExceeded", "BadGateway", "GatewayTimeout"}
+FAKE_REPLY = "This is a reply from the local fake backend."
+
+
+def llm_backend():
+    return os.environ.get("LLM_BACKEND", "gemini").lower()
+
+
+def is_fake_backend():
+    return llm_backend() == "fake"
+
+
+def load_api_key(app_dir, env_file):
+    """Load `<app_dir>/<env_file>`, then a repo-level `.env` for anything still unset; return GOOGLE_API_KEY."""
+    load_dotenv(os.path.join(app_dir, env_file))
+    load_dotenv(os.path.join(REPO_DIR, ".env"))
+    return os.environ.get("GOOGLE_API_KEY")
+
+
+# --- Limits -----------------------------------------------------------------------
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_limits = {}
+_limits_lock = threading.Lock()
+
+
+def limits_for(api_key, max_concurrency, requests_per_minute):
+    """The (semaphore, bucket) pair shared by every client using this API key."""
+    key = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()
+    with _limits_lock:
+        if key not in _limits:
+            _limits[key] = (
+                threading.BoundedSemaphore(max_concurrency),
+                TokenBucket(requests_per_minute / 60.0, capacity=max(1, min(max_concurrency, requests_per_minute))),
+            )
+        return _limits[key]
+
+
+def is_retryable(error):
+    """True for rate limiting and server-side errors, looking through wrapped exceptions.
+
+    Only exception types and status codes count: error messages can contain "429" or "503" by chance.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        status = (getattr(error, "code", None) or getattr(error, "status_code", None)
+                  or getattr(getattr(error, "response", None), "status_code", None))
+        if isinstance(status, int) and status in RETRYABLE_STATUS:
+            return True
+        if type(error).__name__ in RETRYABLE_NAMES:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+# --- Metrics ----------------------------------------------------------------------
+
+@dataclass
+class CallRecord:
+    op: str
+    seconds: float  # wall time including queueing and retries
+    queued: float  # time spent waiting on the rate limit and the semaphore
+    attempts: int
+    ok: bool
+    ttft: float = None
+
+
+class CallMetrics:
+    """Recent call records (bounded) plus lifetime counters."""
+
+    def __init__(self, keep=1000):
+        self.records = deque(maxlen=keep)
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def record(self, record):
+        with self._lock:
+            self.records.append(record)
+            self.calls += 1
+            self.errors += not record.ok
+            self.retries += record.attempts - 1
+        logger.info("%s %s in %.3fs (queued %.3fs, %d attempt(s))", record.op, "ok" if record.ok else "failed",
+                    record.seconds, record.queued, record.attempts)
+
+    @property
+    def last(self):
+        return self.records[-1] if self.records else None
+
+    def summary(self):
+        with self._lock:
+            latencies = np.array([r.seconds for r in self.records if r.ok])
+            queued = np.array([r.queued for r in self.records])
+            calls, errors, retries = self.calls, self.errors, self.retries
+        summary = {"calls": calls, "errors": errors, "retries": retries}
+        if len(latencies):
+            summary.update({
+                "p50_seconds": round(float(np.percentile(latencies, 50)), 3),
+                "p95_seconds": round(float(np.percentile(latencies, 95)), 3),
+                "mean_queued_seconds": round(float(queued.mean()), 3),
+            })
+        return summary
+
+
+# --- Client -------------------------------------------------------------------------
+
+class LLMClient:
+    """Rate-limited, retrying wrapper exposing the chat model's invoke/ainvoke/stream."""
+
+    def __init__(self, chat_model, api_key=None, max_concurrency=4, requests_per_minute=60, max_retries=4,
+                 base_delay=1.0, max_delay=30.0):
+        self.chat_model = chat_model
+        self.semaphore, self.bucket = limits_for(api_key, max_concurrency, requests_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = CallMetrics()
+
+    def _backoff(self, attempt):
+        # Full jitter: concurrent callers hitting a 429 together do not retry in lockstep
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _acquire(self):
+        started = time.perf_counter()
+        self.bucket.acquire()
+        self.semaphore.acquire()
+        return time.perf_counter() - started
+
+    def invoke(self, messages, **kwargs):
+        with span("llm.invoke") as traced:
+            started = time.perf_counter()
+            queued = 0.0
+            for attempt in range(self.max_retries + 1):
+                queued += self._acquire()
+                traced.attrs.update(attempts=attempt + 1, queued_s=round(queued, 3))
+                try:
+                    result = self.chat_model.invoke(messages, **kwargs)
+                except Exception as e:
+                    if attempt == self.max_retries or not is_retryable(e):
+                        self.metrics.record(CallRecord("invoke", time.perf_counter() - started, queued, attempt + 1, False))
+                        raise
+                    delay = self._backoff(attempt)
+                    logger.warning("Retrying after %s in %.2fs (attempt %d)", type(e).__name__, delay, attempt + 1)
+                else:
+                    self.metrics.record(CallRecord("invoke", time.perf_counter() - started, queued, attempt + 1, True))
+                    return result
+                finally:
+                    self.semaphore.release()
+                time.sleep(delay)
+
+    async def ainvoke(self, messages, **kwargs):
+        # The limits are thread primitives shared across sessions, so async callers run on worker threads
+        return await asyncio.to_thread(self.invoke, messages, **kwargs)
+
+    def stream(self, messages, **kwargs):
+        """Yield message chunks; errors before the first chunk are retried, later ones are raised."""
+        started = time.perf_counter()
+        # Started on the tracer directly: a `with` block would straddle the consumer's context across yields
+        traced = tracer.start("llm.stream", {})
+        queued = 0.0
+        for attempt in range(self.max_retries + 1):
+            queued += self._acquire()
+            try:
+                chunks = iter(self.chat_model.stream(messages, **kwargs))
+                first = next(chunks, None)
+            except Exception as e:
+                self.semaphore.release()
+                if attempt == self.max_retries or not is_retryable(e):
+                    self.metrics.record(CallRecord("stream", time.perf_counter() - started, queued, attempt + 1, False))
+                    tracer.finish(traced, e)
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning("Retrying stream after %s in %.2fs (attempt %d)", type(e).__name__, delay, attempt + 1)
+                time.sleep(delay)
+                continue
+
+            ttft = time.perf_counter() - started
+            traced.attrs.update(attempts=attempt + 1, queued_s=round(queued, 3), ttft_s=round(ttft, 3))
+            error = None
+            try:
+                if first is not None:
+                    yield first
+                    yield from chunks
+            except GeneratorExit:
+                # The caller stopped reading early (closed the generator): not a failed call
+                raise
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self.semaphore.release()
+                self.metrics.record(CallRecord("stream", time.perf_counter() - started, queued, attempt + 1, error is None, ttft))
+                tracer.finish(traced, error)
+            return
+
+    def as_runnable(self):
+        """The client as a Runnable, for `prompt | client.as_runnable() | parser` chains."""
+        return RunnableLambda(self.invoke, afunc=self.ainvoke, name="LLMClient")
+
+
+def fake_chat_model(replies=None):
+    """Local chat model that streams canned replies word by word, cycling forever."""
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+    return GenericFakeChatModel(messages=itertools.cycle(AIMessage(content=reply) for reply in replies or [FAKE_REPLY]))
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key=None, model="gemini-1.5-pro", temperature=None, fake_replies=None):
+    """The process-wide client for this backend, model, temperature and API key."""
+    backend = llm_backend()
+    key = (backend, model, temperature, hashlib.sha256((api_key or "").encode("utf-8")).hexdigest())
+    with _clients_lock:
+        if key not in _clients:
+            if backend == "fake":
+                chat_model = fake_chat_model(fake_replies)
+            else:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                options = {"temperature": temperature} if temperature is not None else {}
+                # Retries are handled here, with jitter and shared limits, not inside the SDK
+                chat_model = ChatGoogleGenerativeAI(model=model, google_api_key=api_key, max_retries=0, **options)
+            _clients[key] = LLMClient(
+                chat_model,
+                api_key=api_key,
+                max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "4")),
+                requests_per_minute=float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "60")),
+                max_retries=int(os.environ.get("LLM_MAX_RETRIES", "4")),
+            )
+            logger.info("Created %s client for %s", backend, model)
+        return _clients[key]
@@ -0,0 +1,89 @@
+"""SQLite storage shared by the apps' persistent caches.
+
+- connect: a connection that several threads may use, in WAL mode.
+- BoundedCache: a key -> text table that evicts the least recently used
+  entries once the stored size exceeds `max_bytes`, with hit/miss counters
+  for display in the sidebar.
+
+Subclasses pick the table (and value column) and convert values, e.g.
+
+    class ReviewCache(BoundedCache):
+        table = "reviews"
+"""
+import sqlite3
+import threading
+import time
+
+
+def connect(path):
+    """Open `path` for use from several threads; callers serialize access with their own lock."""
+    # Streamlit serves sessions from several threads, so the connection is not tied to the one that opened it
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+class BoundedCache:
+    """SQLite-backed text cache with least-recently-used eviction by total size."""
+
+    table = "entries"
+    value_column = "value"
+
+    def __init__(self, path, max_bytes=32 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self.table} (
+                key TEXT PRIMARY KEY,
+                {self.value_column} TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_last_access ON {self.table}(last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached text for `key`, or None."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {self.value_column} FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, text):
+        """Store text and evict the least recently used entries beyond `max_bytes`."""
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, {self.value_column}, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, text, len(text.encode("utf-8")), time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_access").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", stale)
+
+    def stats(self):
+        """Entry count, stored bytes and hit/miss counters."""
+        with self._lock:
+            entries, size = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
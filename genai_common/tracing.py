@@ -0,0 +1,337 @@
+"""Span timing, latency histograms and peak-memory sampling shared by every app.
+
+    from genai_common import tracing
+
+    tracing.configure("travel")
+    with tracing.span("travel.plan_route", mode="air"):
+        ...
+
+    @tracing.traced("shazam.transcribe")
+    def transcribe(...): ...
+
+Each finished span is added to an in-process histogram (for p50/p95 and
+Prometheus buckets). The histogram records the peak resident memory seen
+while the span ran. The span is also appended as one line to a JSONL file.
+Memory is read from /proc, or psutil where installed; on platforms with
+neither, the memory figures are left out.
+
+Settings come from the environment:
+    GENAI_TRACE_FILE     JSONL path (default traces/<app>.jsonl in the repo; "off" disables it)
+    GENAI_METRICS_PORT   serve Prometheus text format on http://0.0.0.0:<port>/metrics
+    GENAI_TRACE_PANEL    1 shows the per-stage latency panel in the Streamlit sidebar
+
+Only the standard library is used, so apps without the LLM dependencies
+can import it.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("genai.tracing")
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RESERVOIR_SIZE = 2048
+MAX_TRACE_FILE_BYTES = 50 * 1024 * 1024
+
+_current_span = contextvars.ContextVar("genai_current_span", default=None)
+
+
+def _psutil_process():
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process()
+
+
+_PSUTIL_PROCESS = None if os.path.exists("/proc/self/statm") else _psutil_process()
+
+
+def rss_bytes():
+    """Current resident set size, or 0 where it cannot be read (no /proc and no psutil).
+
+    getrusage's ru_maxrss is not used: it is the lifetime peak rather than the current
+    size, and its unit differs between Linux (KiB) and macOS (bytes).
+    """
+    if _PSUTIL_PROCESS is not None:
+        return _PSUTIL_PROCESS.memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class Histogram:
+    """Cumulative Prometheus-style buckets plus a reservoir of recent durations for percentiles."""
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+        self.peak_rss = 0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds, ok, peak_rss):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+        self.count += 1
+        self.sum += seconds
+        self.errors += not ok
+        self.peak_rss = max(self.peak_rss, peak_rss)
+        self.recent.append(seconds)
+
+    def percentile(self, q):
+        values = sorted(self.recent)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+class Span:
+    def __init__(self, name, attrs, parent):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.started = time.perf_counter()
+        self.start_rss = rss_bytes()
+        self.peak_rss = self.start_rss
+
+
+class Tracer:
+    def __init__(self):
+        self.app = None
+        self.histograms = {}
+        self.process_peak_rss = 0
+        self._lock = threading.Lock()
+        self._active = set()
+        self._trace_file = None
+        self._trace_path = None
+        self._sampler = None
+        self._wake = threading.Event()
+        self._server = None
+
+    # --- Setup --------------------------------------------------------------------
+
+    def configure(self, app):
+        """Set the app label and open the exporters; safe to call on every Streamlit rerun."""
+        with self._lock:
+            if self.app is not None:
+                return self
+            self.app = app
+            path = os.environ.get("GENAI_TRACE_FILE", os.path.join(REPO_DIR, "traces", f"{app}.jsonl"))
+            if path and path.lower() != "off":
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._trace_path = path
+                self._trace_file = open(path, "a", encoding="utf-8")
+            self._sampler = threading.Thread(target=self._sample, name="trace-rss-sampler", daemon=True)
+            self._sampler.start()
+        port = os.environ.get("GENAI_METRICS_PORT")
+        if port:
+            self.start_metrics_server(int(port))
+        return self
+
+    def start_metrics_server(self, port):
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        except OSError as e:
+            logger.warning("Metrics endpoint not started on port %d: %s", port, e)
+            return
+        threading.Thread(target=self._server.serve_forever, name="trace-metrics", daemon=True).start()
+        logger.info("Serving Prometheus metrics on :%d/metrics", port)
+
+    # --- Spans --------------------------------------------------------------------
+
+    def _sample(self, interval=0.01):
+        """Track the peak RSS of every active span; idles while nothing is being traced."""
+        while True:
+            self._wake.wait()
+            with self._lock:
+                spans = list(self._active)
+                if not spans:
+                    self._wake.clear()
+                    continue
+            current = rss_bytes()
+            for s in spans:
+                s.peak_rss = max(s.peak_rss, current)
+            time.sleep(interval)
+
+    def start(self, name, attrs):
+        s = Span(name, attrs, _current_span.get())
+        with self._lock:
+            self._active.add(s)
+        self._wake.set()
+        return s
+
+    def finish(self, s, error=None):
+        seconds = time.perf_counter() - s.started
+        end_rss = rss_bytes()
+        s.peak_rss = max(s.peak_rss, end_rss)
+        with self._lock:
+            self._active.discard(s)
+        if end_rss and s.start_rss:
+            self._record(s.name, seconds, error, s.attrs, s.parent, s.peak_rss, end_rss - s.start_rss)
+        else:
+            self._record(s.name, seconds, error, s.attrs, s.parent)
+        return seconds
+
+    def observe(self, name, seconds, ok=True, **attrs):
+        """Record a duration measured elsewhere (e.g. in a worker), without memory figures."""
+        self._record(name, seconds, None if ok else "failed", attrs)
+
+    def _record(self, name, seconds, error, attrs, parent=None, peak_rss=None, rss_delta=None):
+        with self._lock:
+            histogram = self.histograms.setdefault(name, Histogram())
+            histogram.observe(seconds, error is None, peak_rss or 0)
+            if peak_rss is not None:
+                self.process_peak_rss = max(self.process_peak_rss, peak_rss)
+            if self._trace_file is None:
+                return
+            record = {
+                "ts": time.time(),
+                "app": self.app,
+                "span": name,
+                "parent": parent.name if parent else None,
+                "seconds": round(seconds, 6),
+                "ok": error is None,
+                "error": error if isinstance(error, (str, type(None))) else f"{type(error).__name__}: {error}",
+                "peak_rss_mb": round(peak_rss / 2 ** 20, 1) if peak_rss is not None else None,
+                "rss_delta_mb": round(rss_delta / 2 ** 20, 1) if rss_delta is not None else None,
+                "thread": threading.current_thread().name,
+                **({"attrs": attrs} if attrs else {}),
+            }
+            self._trace_file.write(json.dumps(record, default=str) + "\n")
+            self._trace_file.flush()
+            self._rotate()
+
+    def _rotate(self):
+        if self._trace_file.tell() > MAX_TRACE_FILE_BYTES:
+            self._trace_file.close()
+            os.replace(self._trace_path, self._trace_path + ".1")
+            self._trace_file = open(self._trace_path, "a", encoding="utf-8")
+
+    # --- Reporting ----------------------------------------------------------------
+
+    def summary(self):
+        """Per-span count, p50/p95/max latency in ms, errors and peak RSS, sorted by span name."""
+        with self._lock:
+            rows = []
+            for name, h in sorted(self.histograms.items()):
+                rows.append({
+                    "span": name,
+                    "count": h.count,
+                    "p50_ms": round(h.percentile(50) * 1000, 1),
+                    "p95_ms": round(h.percentile(95) * 1000, 1),
+                    "max_ms": round(max(h.recent) * 1000, 1),
+                    "errors": h.errors,
+                    "peak_rss_mb": round(h.peak_rss / 2 ** 20, 1) if h.peak_rss else None,
+                })
+        return rows
+
+    def prometheus_text(self):
+        app = self.app or "unknown"
+        lines = [
+            "# HELP genai_span_seconds Duration of traced spans.",
+            "# TYPE genai_span_seconds histogram",
+        ]
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            for name, h in histograms:
+                labels = f'app="{app}",span="{name}"'
+                for bound, count in zip(BUCKETS, h.bucket_counts):
+                    lines.append(f'genai_span_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'genai_span_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f"genai_span_seconds_sum{{{labels}}} {h.sum}")
+                lines.append(f"genai_span_seconds_count{{{labels}}} {h.count}")
+            lines += ["# HELP genai_span_errors_total Spans that raised.", "# TYPE genai_span_errors_total counter"]
+            lines += [f'genai_span_errors_total{{app="{app}",span="{name}"}} {h.errors}' for name, h in histograms]
+            if self.process_peak_rss:
+                lines += ["# HELP genai_span_peak_rss_bytes Highest RSS seen while a span ran.",
+                          "# TYPE genai_span_peak_rss_bytes gauge"]
+                lines += [f'genai_span_peak_rss_bytes{{app="{app}",span="{name}"}} {h.peak_rss}'
+                          for name, h in histograms if h.peak_rss]
+                lines += ["# HELP genai_process_peak_rss_bytes Highest RSS seen during any span.",
+                          "# TYPE genai_process_peak_rss_bytes gauge",
+                          f'genai_process_peak_rss_bytes{{app="{app}"}} {self.process_peak_rss}']
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer()
+
+
+def configure(app):
+    return tracer.configure(app)
+
+
+class span:
+    """Time a block: `with span("stage", key=value): ...`."""
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.seconds = None
+
+    def __enter__(self):
+        self._span = tracer.start(self.name, self.attrs)
+        self._token = _current_span.set(self._span)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        self.seconds = tracer.finish(self._span, exc)
+        return False
+
+
+def traced(name=None):
+    """Decorator form of `span`; the span is named after the function unless `name` is given."""
+    def decorate(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def render_streamlit_panel():
+    """Per-stage p50/p95 for this process in a sidebar expander, when GENAI_TRACE_PANEL=1."""
+    if os.environ.get("GENAI_TRACE_PANEL", "0") != "1":
+        return
+    import streamlit as st
+
+    with st.sidebar.expander("⏱️ Stage latency (this process)"):
+        rows = tracer.summary()
+        if not rows:
+            st.caption("Nothing traced yet.")
+        else:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+            if tracer.process_peak_rss:
+                st.caption(f"Peak RSS during traced work: {tracer.process_peak_rss / 2 ** 20:.0f} MiB")